@@ -1,5 +1,9 @@
 # for tasking system to ensure only one migration is run at a time
 PULP_2TO3_MIGRATION_RESOURCE = "pulp_2to3_migration"
+# for tasking system to order sharded content migration tasks
+PULP_2TO3_CONTENT_RESOURCE = "pulp_2to3_migration.content"
+# for tasking system to limit the number of publications created in parallel
+PULP_2TO3_PUBLICATION_RESOURCE = "pulp_2to3_migration.publication"
 
 PULP_2TO3_POLICIES = {
     "immediate": "immediate",
@@ -10,3 +14,8 @@ PULP_2TO3_POLICIES = {
 NOT_USED = "Not Used"
 
 DEFAULT_BATCH_SIZE = 1000
+
+# which content to migrate with regard to the content skipped during previous migration runs
+SKIPPED_CONTENT_INCLUDE = "include"
+SKIPPED_CONTENT_ONLY = "only"
+SKIPPED_CONTENT_EXCLUDE = "exclude"
@@ -0,0 +1,103 @@
+from gettext import gettext as _
+import itertools
+import time
+
+from django.core.management import BaseCommand, CommandError
+
+from pulpcore.constants import TASK_FINAL_STATES, TASK_STATES
+from pulpcore.plugin.tasking import dispatch
+
+from pulp_2to3_migration.app.constants import PULP_2TO3_MIGRATION_RESOURCE
+from pulp_2to3_migration.app.models import MigrationPlan
+from pulp_2to3_migration.app.tasks import benchmark_content_migration
+
+
+class Command(BaseCommand):
+    """
+    Django management command for tuning the content migration pipeline.
+
+    Content of the plugins in a migration plan is migrated once for every combination of the
+    specified queue sizes and batch sizes, and the time of each content migration is reported.
+    Per-stage statistics are available in the progress reports and logs of the benchmark task.
+
+    Pulp 3 data for the plugins in the migration plan is reset and all orphan content and
+    artifacts are removed before every run, so every run creates all the artifacts. The command
+    must only be used on a staging copy of the Pulp 3 database. Pulp 3 workers have to be running.
+    """
+
+    help = _(__doc__)
+
+    def add_arguments(self, parser):
+        """Set up arguments."""
+        parser.add_argument("plan", help=_("PK of the migration plan to benchmark."))
+        parser.add_argument(
+            "--maxsize",
+            type=int,
+            nargs="+",
+            default=[1],
+            help=_("Sizes of the queues between the stages to try. Default is 1."),
+        )
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            nargs="+",
+            default=[None],
+            help=_("Batch sizes for all the stages to try. Default is the pulpcore default."),
+        )
+        parser.add_argument(
+            "--stage-batch-size",
+            nargs="+",
+            default=[],
+            metavar="STAGE=SIZE",
+            help=_("Batch sizes of particular stages, used for every run, e.g. ContentSaver=500."),
+        )
+        parser.add_argument(
+            "--poll-interval",
+            type=int,
+            default=10,
+            help=_("How often to check if the benchmark is finished, in seconds. Default is 10."),
+        )
+
+    def handle(self, *args, **options):
+        """Implement the command."""
+        try:
+            plan = MigrationPlan.objects.get(pk=options["plan"])
+        except (MigrationPlan.DoesNotExist, ValueError):
+            raise CommandError(_("Migration plan {} does not exist.").format(options["plan"]))
+
+        stage_batch_sizes = {}
+        for stage_batch_size in options["stage_batch_size"]:
+            stage, _sep, size = stage_batch_size.partition("=")
+            if not size.isdigit() or int(size) <= 0:
+                raise CommandError(
+                    _("Invalid stage batch size '{}', expected STAGE=SIZE.").format(
+                        stage_batch_size
+                    )
+                )
+            stage_batch_sizes[stage] = int(size)
+
+        pipeline_configs = []
+        for maxsize, batch_size in itertools.product(options["maxsize"], options["batch_size"]):
+            pipeline_config = {"maxsize": maxsize, "stage_batch_sizes": stage_batch_sizes}
+            if batch_size:
+                pipeline_config["batch_size"] = batch_size
+            pipeline_configs.append(pipeline_config)
+
+        task = dispatch(
+            benchmark_content_migration,
+            exclusive_resources=[PULP_2TO3_MIGRATION_RESOURCE],
+            kwargs={"migration_plan_pk": str(plan.pk), "pipeline_configs": pipeline_configs},
+        )
+        self.stdout.write(_("Dispatched benchmark task {}").format(task.pk))
+
+        while task.state not in TASK_FINAL_STATES:
+            time.sleep(options["poll_interval"])
+            task.refresh_from_db()
+
+        for report in task.progress_reports.filter(code="benchmark.content.migration").order_by(
+            "pulp_created"
+        ):
+            self.stdout.write(report.message)
+
+        if task.state != TASK_STATES.COMPLETED:
+            raise CommandError(_("Benchmark task {} is {}.").format(task.pk, task.state))
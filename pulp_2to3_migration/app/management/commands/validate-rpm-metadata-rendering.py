@@ -0,0 +1,72 @@
+from gettext import gettext as _
+
+from django.core.management import BaseCommand, CommandError
+
+from pulp_2to3_migration.app.plugin.rpm.pulp_2to3_models import Pulp2Rpm, Pulp2Srpm
+from pulp_2to3_migration.app.plugin.rpm.xml_utils import (
+    ESCAPE_TEMPLATE_VARS_TAGS,
+    METADATA_TYPES,
+    _render_django_template,
+    decompress_repodata,
+    render_template,
+)
+
+
+class Command(BaseCommand):
+    """
+    Django management command to validate rendering of RPM metadata templates stored in Pulp 2.
+
+    Metadata templates of the pre-migrated RPM packages are rendered both with the fast renderer
+    used during the migration and with the Django template engine, as Pulp 2 does, and the results
+    are compared. Nothing is modified.
+    """
+
+    help = _(__doc__)
+
+    def add_arguments(self, parser):
+        """Set up arguments."""
+        parser.add_argument(
+            "--limit",
+            type=int,
+            default=10000,
+            help=_("The max number of packages of each type to validate. Default is 10000."),
+        )
+
+    def handle(self, *args, **options):
+        """Implement the command."""
+        validated = 0
+        mismatched = []
+        for model in (Pulp2Rpm, Pulp2Srpm):
+            packages = model.objects.only(
+                "pulp2content",
+                "checksum",
+                "checksumtype",
+                "primary_template_gz",
+                "filelists_template_gz",
+                "other_template_gz",
+            )[: options["limit"]]
+            for pkg in packages.iterator():
+                contexts = {
+                    "primary": {"checksum": pkg.checksum, "checksumtype": pkg.checksumtype},
+                    "other": {"pkgid": pkg.checksum},
+                    "filelists": {"pkgid": pkg.checksum},
+                }
+                for md_type in METADATA_TYPES:
+                    template = decompress_repodata(getattr(pkg, f"{md_type}_template_gz"))
+                    escape_tags = ESCAPE_TEMPLATE_VARS_TAGS[md_type]
+                    context = contexts[md_type]
+                    if render_template(template, context, escape_tags) != _render_django_template(
+                        template, context, escape_tags
+                    ):
+                        mismatched.append((pkg.pulp2content_id, md_type))
+                validated += 1
+
+        for pulp2content_id, md_type in mismatched:
+            self.stdout.write(
+                _("Pulp2Content {}: {} metadata is rendered differently").format(
+                    pulp2content_id, md_type
+                )
+            )
+        self.stdout.write(_("Validated {} packages").format(validated))
+        if mismatched:
+            raise CommandError(_("{} metadata snippets differ").format(len(mismatched)))
@@ -1,14 +1,19 @@
 import logging
 
+from collections import Counter, defaultdict
+
+from django.conf import settings
 from django.db.models import F, Q
 from gettext import gettext as _
 
 from pygtrie import StringTrie
 
+from pulpcore.plugin.constants import TASK_STATES
 from pulpcore.plugin.models import (
     Content,
     ContentArtifact,
     CreatedResource,
+    GroupProgressReport,
     ProgressReport,
     Repository,
     SigningService,
@@ -17,18 +22,62 @@ from pulpcore.plugin.models import (
 
 from pulpcore.plugin.tasking import dispatch
 
+from pulp_2to3_migration.app.constants import (
+    PULP_2TO3_CONTENT_RESOURCE,
+    PULP_2TO3_PUBLICATION_RESOURCE,
+    SKIPPED_CONTENT_INCLUDE,
+)
 from pulp_2to3_migration.app.models import (
+    MigrationPlan,
     Pulp2Content,
     Pulp2Importer,
     Pulp2Distributor,
     Pulp2RepoContent,
     Pulp2Repository,
 )
+from pulp_2to3_migration.app.plugin.artifact_storage import precreate_artifact_dirs
+from pulp_2to3_migration.app.storage_check import (
+    failed_storage_checks,
+    record_failed_storage_checks,
+)
+from pulp_2to3_migration.exceptions import ArtifactValidationError, ContentMigrationError
+from pulp_2to3_migration.pulp2 import connection
 
 _logger = logging.getLogger(__name__)
 
 
-def migrate_content(plan, skip_corrupted=False):
+def check_failed_storage(plugin, skip_corrupted=False):
+    """
+    Fail fast if the pre-flight storage check found any problems with the plugin content.
+
+    If such content can be skipped, it's recorded as Pulp2SkippedContent instead.
+
+    Args:
+         plugin (PluginMigrationPlan): Migration plan for a plugin
+         skip_corrupted (bool): If True, corrupted content is skipped during migration,
+                                no task failure.
+
+    Raises:
+        ArtifactValidationError: If missing or corrupted content was found and it can't be skipped
+
+    """
+    content_types = plugin.migrator.content_models.keys()
+    if skip_corrupted:
+        # such content is not migrated, make it visible and retriable as skipped content
+        record_failed_storage_checks(content_types)
+        return
+
+    num_failed = failed_storage_checks(content_types).count()
+    if num_failed:
+        raise ArtifactValidationError(
+            f"The storage check found {num_failed} missing or corrupted Pulp 2 "
+            f"content units of the {plugin.type} plugin. Repair them in Pulp 2 and "
+            f"re-run the storage check. Alternatively, run migration with "
+            f"skip_corrupted=True."
+        )
+
+
+def migrate_content(plan, skip_corrupted=False, skipped_content=SKIPPED_CONTENT_INCLUDE):
     """
     A coroutine to initiate content migration for each plugin.
 
@@ -36,8 +85,13 @@ def migrate_content(plan, skip_corrupted=False):
          plan (MigrationPlan): Migration Plan to use
          skip_corrupted (bool): If True, corrupted content is skipped during migration,
                                 no task failure.
+         skipped_content (str): Whether to migrate content skipped during previous migration
+                                runs, ``include``, ``only`` or ``exclude`` it.
 
     """
+    if settings.PRECREATE_ARTIFACT_DIRS:
+        precreate_artifact_dirs()
+
     progress_data = dict(message="Migrating content to Pulp 3", code="migrating.content", total=0)
     with ProgressReport(**progress_data) as pb:
         # schedule content migration into Pulp 3 using pre-migrated Pulp 2 content
@@ -51,13 +105,286 @@ def migrate_content(plan, skip_corrupted=False):
             pb.total += num_to_migrate
             pb.save()
 
+            check_failed_storage(plugin, skip_corrupted=skip_corrupted)
+
             # migrate
-            plugin.migrator.migrate_content_to_pulp3(skip_corrupted=skip_corrupted)
+            plugin.migrator.migrate_content_to_pulp3(
+                skip_corrupted=skip_corrupted, skipped_content=skipped_content
+            )
 
             pb.done = pb.total
             pb.save()
 
 
+def get_content_type_levels(migrator):
+    """
+    Group content types of a plugin by the order they can be migrated in.
+
+    Content types of the same level don't depend on each other, content types of the next level
+    can be migrated only after all the content types of the previous levels are migrated.
+
+    Args:
+        migrator(Pulp2to3PluginMigrator): A plugin migrator
+
+    Returns:
+        list: Lists of content types, one list per level
+
+    """
+    dependencies = migrator.get_content_type_dependencies()
+    levels = {}
+
+    def get_level(content_type):
+        if content_type not in levels:
+            prerequisites = [
+                dependency
+                for dependency in dependencies.get(content_type, [])
+                if dependency in migrator.content_models
+            ]
+            levels[content_type] = max([get_level(dep) + 1 for dep in prerequisites], default=0)
+        return levels[content_type]
+
+    content_types_by_level = defaultdict(list)
+    for content_type in migrator.content_models:
+        content_types_by_level[get_level(content_type)].append(content_type)
+    return [content_types_by_level[level] for level in sorted(content_types_by_level)]
+
+
+def get_pulp2content_to_migrate(migrator, content_types):
+    """
+    Get pre-migrated content of the content types which is going to be migrated.
+
+    Args:
+        migrator(Pulp2to3PluginMigrator): A plugin migrator
+        content_types(list): Pulp 2 content types
+
+    Returns:
+        django.db.models.QuerySet: Pulp2Content which hasn't been migrated yet or, for the lazy
+                                   types, which is queued for migration
+
+    """
+    lazy_types = [ctype for ctype in content_types if ctype in migrator.lazy_types]
+    other_types = [ctype for ctype in content_types if ctype not in migrator.lazy_types]
+    return Pulp2Content.objects.filter(
+        Q(pending_migration__pulp2_content_type_id__in=lazy_types)
+        | Q(pulp2_content_type_id__in=other_types, pulp3_content=None)
+    )
+
+
+def get_pulp2content_ranges(migrator, content_type, shard_size):
+    """
+    Split content of a content type which is going to be migrated into ranges of Pulp2Content pks.
+
+    Args:
+        migrator(Pulp2to3PluginMigrator): A plugin migrator
+        content_type(str): Pulp 2 content type
+        shard_size(int): Max number of Pulp2Content in a range
+
+    Returns:
+        list: (lower bound, upper bound) tuples, the lower bound is included, the upper bound is
+              excluded; None means the range is not bounded.
+
+    """
+    pks = (
+        get_pulp2content_to_migrate(migrator, [content_type])
+        .order_by("pk")
+        .values_list("pk", flat=True)
+    )
+    if not pks.exists():
+        return []
+
+    boundaries = [str(pk) for idx, pk in enumerate(pks.iterator()) if idx and idx % shard_size == 0]
+    return list(zip([None] + boundaries, boundaries + [None]))
+
+
+def check_failed_content_migration():
+    """
+    Fail if any task of the current task group has failed or was canceled.
+
+    Sharded content migration tasks are ordered only by the resources they reserve, so the
+    dependent tasks run even if the tasks they wait for fail.
+
+    Raises:
+        ContentMigrationError: If any task of the task group has failed or was canceled
+
+    """
+    failed_tasks = TaskGroup.current().tasks.filter(
+        state__in=[TASK_STATES.FAILED, TASK_STATES.CANCELED]
+    )
+    if failed_tasks.exists():
+        raise ContentMigrationError(
+            f"{failed_tasks.count()} content migration tasks have failed or were canceled. "
+            f"Fix the issues and re-run the migration."
+        )
+
+
+def dispatch_content_migration(plan, skip_corrupted=False, skipped_content=SKIPPED_CONTENT_INCLUDE):
+    """
+    Dispatch content migration as multiple tasks, so it can run on several workers in parallel.
+
+    Content of each content type is split into shards by Pulp2Content pks. Shards of the content
+    types which don't depend on each other are migrated in parallel, shards of the dependent
+    content types wait for all shards of their prerequisites to finish.
+    Repository versions, publications and distributions are created after all the content is
+    migrated.
+
+    Args:
+         plan (MigrationPlan): Migration Plan to use
+         skip_corrupted (bool): If True, corrupted content is skipped during migration,
+                                no task failure.
+         skipped_content (str): Whether to migrate content skipped during previous migration
+                                runs, ``include``, ``only`` or ``exclude`` it.
+
+    """
+    if settings.PRECREATE_ARTIFACT_DIRS:
+        precreate_artifact_dirs()
+
+    task_group = TaskGroup.current()
+    shard_size = settings.CONTENT_MIGRATION_SHARD_SIZE
+    progress_report = GroupProgressReport(
+        message="Migrating content to Pulp 3",
+        code="migrating.content",
+        task_group=task_group,
+        total=0,
+    )
+    progress_report.save()
+
+    for plugin in plan.get_plugin_plans():
+        # only used for progress bar counters
+        content_types = plugin.migrator.content_models.keys()
+        progress_report.total += get_pulp2content_to_migrate(plugin.migrator, content_types).count()
+        progress_report.save()
+
+        check_failed_storage(plugin, skip_corrupted=skip_corrupted)
+
+        levels = get_content_type_levels(plugin.migrator)
+        previous_level_resource = None
+        for level, content_types in enumerate(levels):
+            level_resource = f"{PULP_2TO3_CONTENT_RESOURCE}.{plugin.type}.{level}"
+            shared_resources = [PULP_2TO3_CONTENT_RESOURCE, level_resource]
+            if previous_level_resource:
+                shared_resources.append(previous_level_resource)
+
+            for content_type in content_types:
+                for pulp2content_range in get_pulp2content_ranges(
+                    plugin.migrator, content_type, shard_size
+                ):
+                    dispatch(
+                        migrate_content_shard,
+                        shared_resources=shared_resources,
+                        task_group=task_group,
+                        kwargs={
+                            "plugin_type": plugin.type,
+                            "content_types": [content_type],
+                            "pulp2content_range": pulp2content_range,
+                            "check_failures": level > 0,
+                            "skip_corrupted": skip_corrupted,
+                            "skipped_content": skipped_content,
+                        },
+                    )
+
+            if level < len(levels) - 1:
+                # The next level shards wait for this task which waits for all the shards of this
+                # level to finish, because it needs the level resource exclusively.
+                dispatch(
+                    content_migration_barrier,
+                    exclusive_resources=[level_resource],
+                    task_group=task_group,
+                )
+            previous_level_resource = level_resource
+
+    dispatch(
+        finish_content_migration,
+        exclusive_resources=[PULP_2TO3_CONTENT_RESOURCE],
+        task_group=task_group,
+        kwargs={"migration_plan_pk": str(plan.pk)},
+    )
+
+
+def migrate_content_shard(
+    plugin_type,
+    content_types,
+    pulp2content_range,
+    skip_corrupted=False,
+    skipped_content=SKIPPED_CONTENT_INCLUDE,
+    check_failures=False,
+):
+    """
+    Migrate a shard of pre-migrated content of a plugin.
+
+    Args:
+        plugin_type(str): Plugin type
+        content_types(list): Pulp 2 content types to migrate
+        pulp2content_range(list): Lower (included) and upper (excluded) bounds of Pulp2Content
+                                  pks to migrate, None means the range is not bounded
+        skip_corrupted (bool): If True, corrupted content is skipped during migration,
+                               no task failure.
+        skipped_content (str): Whether to migrate content skipped during previous migration
+                               runs, ``include``, ``only`` or ``exclude`` it.
+        check_failures (bool): If True, fail if any task of the task group has failed already,
+                               it's used for the shards which depend on other shards.
+    """
+    from pulp_2to3_migration.app.plugin import PLUGIN_MIGRATORS
+
+    if check_failures:
+        check_failed_content_migration()
+
+    # MongoDB connection initialization
+    connection.initialize()
+
+    migrator = PLUGIN_MIGRATORS.get(plugin_type)
+    lower_bound, upper_bound = pulp2content_range
+    # only used for progress bar counters
+    shard_qs = get_pulp2content_to_migrate(migrator, content_types)
+    if lower_bound:
+        shard_qs = shard_qs.filter(pk__gte=lower_bound)
+    if upper_bound:
+        shard_qs = shard_qs.filter(pk__lt=upper_bound)
+    num_to_migrate = shard_qs.count()
+
+    shard = {"content_types": content_types, "pulp2content_range": pulp2content_range}
+    migrator.migrate_content_to_pulp3(
+        skip_corrupted=skip_corrupted, shard=shard, skipped_content=skipped_content
+    )
+
+    TaskGroup.current().group_progress_reports.filter(code="migrating.content").update(
+        done=F("done") + num_to_migrate
+    )
+
+
+def content_migration_barrier():
+    """
+    Used to order content migration tasks, see ``dispatch_content_migration``.
+
+    It fails if any of the shards it waits for has failed, so the failure is visible before the
+    next level of shards starts.
+    """
+    check_failed_content_migration()
+
+
+def finish_content_migration(migration_plan_pk):
+    """
+    Create repository versions, publications and distributions after sharded content migration.
+
+    Nothing is created if any content migration task has failed, otherwise repositories would be
+    marked as migrated without all their content.
+
+    Args:
+        migration_plan_pk (str): The migration plan PK.
+    """
+    task_group = TaskGroup.current()
+    try:
+        check_failed_content_migration()
+
+        # MongoDB connection initialization
+        connection.initialize()
+
+        plan = MigrationPlan.objects.get(pk=migration_plan_pk)
+        create_repoversions_publications_distributions(plan)
+    finally:
+        # all the tasks of the group have been dispatched by now
+        task_group.finish()
+
+
 def migrate_repositories(plan):
     """
     A coroutine to migrate pre-migrated repositories.
@@ -146,7 +473,7 @@ def migrate_importers(plan):
                 pb.save()
 
 
-def complex_repo_migration(plugin_type, pulp3_repo_setup, repo_name):
+def complex_repo_migration(plugin_type, pulp3_repo_setup, repo_name, dispatch_publications=False):
     """Perform a complex migration for a particular repo using the repo setup config.
 
     Create all repository versions, publications, distributions.
@@ -155,6 +482,9 @@ def complex_repo_migration(plugin_type, pulp3_repo_setup, repo_name):
         plugin_type(str): Plugin type
         pulp3_repo_setup: Pulp 3 repo setup config for a plugin
         repo_name: Name of the repo to be migrated
+        dispatch_publications(bool): If True and the ``PARALLEL_PUBLICATION_TASKS`` setting is
+                                     set, publications and distributions are created in separate
+                                     tasks, see ``dispatch_repo_distributors_migration``
     """
     from pulp_2to3_migration.app.plugin import PLUGIN_MIGRATORS
 
@@ -229,6 +559,12 @@ def complex_repo_migration(plugin_type, pulp3_repo_setup, repo_name):
             if decrease_total:
                 progress_dist.update(total=F("total") - decrease_total)
 
+            if dispatch_publications and settings.PARALLEL_PUBLICATION_TASKS:
+                dispatch_repo_distributors_migration(
+                    plugin_type, repo_name, migrated_repo, pulp2dist, signing_service
+                )
+                continue
+
             for dist in pulp2dist:
                 dist_migrator = distributor_migrators.get(dist.pulp2_type_id)
                 migrate_repo_distributor(
@@ -243,6 +579,111 @@ def complex_repo_migration(plugin_type, pulp3_repo_setup, repo_name):
                 migrated_repo.pulp2_dists.add(dist)
 
 
+def get_publication_slot(task_group):
+    """
+    Pick a publication resource for a new publication task.
+
+    The resource with the fewest waiting or running publication tasks of the task group is picked,
+    so the tasks are spread evenly. A task waits for the tasks dispatched before it for the same
+    resource, even if another resource becomes free earlier.
+
+    Args:
+        task_group(TaskGroup): The task group of the migration
+
+    Returns:
+        str: The publication resource to reserve exclusively
+
+    """
+    task_name = f"{migrate_repo_distributors.__module__}.{migrate_repo_distributors.__name__}"
+    slots = [
+        f"{PULP_2TO3_PUBLICATION_RESOURCE}.{slot}"
+        for slot in range(settings.PARALLEL_PUBLICATION_TASKS)
+    ]
+    unfinished_tasks = task_group.tasks.filter(
+        name=task_name, state__in=[TASK_STATES.WAITING, TASK_STATES.RUNNING]
+    )
+    load = Counter()
+    for resources in unfinished_tasks.values_list("reserved_resources_record", flat=True):
+        load.update(resources or [])
+    return min(slots, key=lambda slot: load[slot])
+
+
+def dispatch_repo_distributors_migration(
+    plugin_type, repo_name, pulp2_repo, pulp2dists, signing_service
+):
+    """
+    Dispatch a task to create publications and distributions for a migrated repository version.
+
+    Publications can take a long time to create, e.g. RPM metadata generation, so they are created
+    in separate tasks while repository versions for other repositories are being created.
+    The number of these tasks running in parallel is limited by the ``PARALLEL_PUBLICATION_TASKS``
+    setting, each of them needs one of the publication resources exclusively, see
+    ``get_publication_slot``.
+
+    Args:
+        plugin_type(str): Plugin type
+        repo_name(str): Name of the Pulp 3 repo the publications are created for
+        pulp2_repo(Pulp2Repository): a migrated repository to create publications for
+        pulp2dists(QuerySet): pre-migrated distributors to migrate
+        signing_service(SigningService): a signing service to use for publications, if any
+    """
+    pulp2dist_pks = [str(pk) for pk in pulp2dists.values_list("pk", flat=True)]
+    if not pulp2dist_pks:
+        return
+
+    task_group = TaskGroup.current()
+    repository = Repository.objects.get(name=repo_name).cast()
+    dispatch(
+        migrate_repo_distributors,
+        exclusive_resources=[get_publication_slot(task_group)],
+        shared_resources=[repository],
+        task_group=task_group,
+        kwargs={
+            "plugin_type": plugin_type,
+            "pulp2_repo_pk": str(pulp2_repo.pk),
+            "pulp2dist_pks": pulp2dist_pks,
+            "signing_service_pk": str(signing_service.pk) if signing_service else None,
+        },
+    )
+
+
+def migrate_repo_distributors(plugin_type, pulp2_repo_pk, pulp2dist_pks, signing_service_pk=None):
+    """
+    Create publications and distributions for a migrated repository version.
+
+    Args:
+        plugin_type(str): Plugin type
+        pulp2_repo_pk(str): PK of a migrated repository to create publications for
+        pulp2dist_pks(list): PKs of pre-migrated distributors to migrate
+        signing_service_pk(str): PK of a signing service to use for publications, if any
+    """
+    from pulp_2to3_migration.app.plugin import PLUGIN_MIGRATORS
+
+    # MongoDB connection initialization
+    connection.initialize()
+
+    distributor_migrators = PLUGIN_MIGRATORS.get(plugin_type).distributor_migrators
+    signing_service = None
+    if signing_service_pk:
+        signing_service = SigningService.objects.get(pk=signing_service_pk)
+    progress_dist = TaskGroup.current().group_progress_reports.filter(code="create.distribution")
+
+    migrated_repo = Pulp2Repository.objects.get(pk=pulp2_repo_pk)
+    pulp2dist = Pulp2Distributor.objects.filter(pk__in=pulp2dist_pks, is_migrated=False)
+    for dist in pulp2dist:
+        dist_migrator = distributor_migrators.get(dist.pulp2_type_id)
+        migrate_repo_distributor(
+            dist_migrator,
+            progress_dist,
+            dist,
+            migrated_repo.pulp3_repository_version,
+            signing_service,
+        )
+        # add distirbutors specified in the complex plan
+        # these can be native and not native distributors
+        migrated_repo.pulp2_dists.add(dist)
+
+
 def create_repoversions_publications_distributions(plan, parallel=True):
     """
     A coroutine to create repository versions.
@@ -296,6 +737,7 @@ def create_repoversions_publications_distributions(plan, parallel=True):
                         complex_repo_migration,
                         exclusive_resources=[repo],
                         args=task_args,
+                        kwargs={"dispatch_publications": True},
                         task_group=TaskGroup.current(),
                     )
         else:
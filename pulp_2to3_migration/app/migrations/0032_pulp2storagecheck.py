@@ -0,0 +1,58 @@
+# Generated by Django 3.2.13 on 2022-06-01 10:12
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_lifecycle.mixins
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pulp_2to3_migration", "0031_add_repoid_to_deb_types"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Pulp2StorageCheck",
+            fields=[
+                (
+                    "pulp_id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("pulp_created", models.DateTimeField(auto_now_add=True)),
+                ("pulp_last_updated", models.DateTimeField(auto_now=True, null=True)),
+                (
+                    "status",
+                    models.CharField(
+                        choices=[
+                            ("ok", "ok"),
+                            ("missing", "missing"),
+                            ("corrupted", "corrupted"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                ("checksums_verified", models.BooleanField(default=False)),
+                ("pulp2_last_updated", models.PositiveIntegerField()),
+                (
+                    "pulp2content",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="storage_check",
+                        to="pulp_2to3_migration.pulp2content",
+                    ),
+                ),
+            ],
+            bases=(django_lifecycle.mixins.LifecycleModelMixin, models.Model),
+        ),
+        migrations.AddIndex(
+            model_name="pulp2storagecheck",
+            index=models.Index(fields=["status"], name="pulp_2to3_m_status_2055f7_idx"),
+        ),
+    ]
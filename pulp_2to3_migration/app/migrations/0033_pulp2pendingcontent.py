@@ -0,0 +1,74 @@
+# Generated by Django 3.2.13 on 2022-06-08 09:41
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_lifecycle.mixins
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pulp_2to3_migration", "0032_pulp2storagecheck"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Pulp2PendingContent",
+            fields=[
+                (
+                    "pulp_id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("pulp_created", models.DateTimeField(auto_now_add=True)),
+                ("pulp_last_updated", models.DateTimeField(auto_now=True, null=True)),
+                ("pulp2_content_type_id", models.CharField(max_length=255)),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[
+                            ("new", "new"),
+                            ("new_lce", "new_lce"),
+                            ("retry", "retry"),
+                        ],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "pulp2content",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="pending_migration",
+                        to="pulp_2to3_migration.pulp2content",
+                    ),
+                ),
+            ],
+            bases=(django_lifecycle.mixins.LifecycleModelMixin, models.Model),
+        ),
+        migrations.AddIndex(
+            model_name="pulp2pendingcontent",
+            index=models.Index(
+                fields=["pulp2_content_type_id"], name="pulp_2to3_m_pulp2_c_ab20ca_idx"
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pulp2content",
+            index=models.Index(
+                condition=models.Q(pulp3_content=None),
+                fields=["pulp2_content_type_id"],
+                name="pulp2content_not_migrated_idx",
+            ),
+        ),
+        migrations.AddIndex(
+            model_name="pulp2lazycatalog",
+            index=models.Index(
+                fields=["pulp2_content_type_id", "is_migrated"],
+                name="pulp_2to3_m_pulp2_c_486763_idx",
+            ),
+        ),
+    ]
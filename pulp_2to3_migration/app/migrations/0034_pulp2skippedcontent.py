@@ -0,0 +1,56 @@
+# Generated by Django 3.2.13 on 2022-06-15 13:27
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django_lifecycle.mixins
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pulp_2to3_migration", "0033_pulp2pendingcontent"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Pulp2SkippedContent",
+            fields=[
+                (
+                    "pulp_id",
+                    models.UUIDField(
+                        default=uuid.uuid4,
+                        editable=False,
+                        primary_key=True,
+                        serialize=False,
+                    ),
+                ),
+                ("pulp_created", models.DateTimeField(auto_now_add=True)),
+                ("pulp_last_updated", models.DateTimeField(auto_now=True, null=True)),
+                ("pulp2_content_type_id", models.CharField(max_length=255)),
+                ("pulp2_storage_path", models.TextField()),
+                (
+                    "reason",
+                    models.CharField(
+                        choices=[("missing", "missing"), ("corrupted", "corrupted")],
+                        max_length=20,
+                    ),
+                ),
+                (
+                    "pulp2content",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        related_name="skipped_migration",
+                        to="pulp_2to3_migration.pulp2content",
+                    ),
+                ),
+            ],
+            bases=(django_lifecycle.mixins.LifecycleModelMixin, models.Model),
+        ),
+        migrations.AddIndex(
+            model_name="pulp2skippedcontent",
+            index=models.Index(
+                fields=["pulp2_content_type_id"], name="pulp_2to3_m_pulp2_c_e4fa15_idx"
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 3.2.13 on 2022-06-20 10:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pulp_2to3_migration", "0034_pulp2skippedcontent"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pulp2distributor",
+            name="pulp3_publication_fingerprint",
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.AddIndex(
+            model_name="pulp2distributor",
+            index=models.Index(
+                fields=["pulp3_publication_fingerprint"], name="pulp_2to3_m_pulp3_p_0c756c_idx"
+            ),
+        ),
+    ]
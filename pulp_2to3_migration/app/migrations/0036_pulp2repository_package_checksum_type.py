@@ -0,0 +1,18 @@
+# Generated by Django 3.2.13 on 2022-06-21 09:41
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("pulp_2to3_migration", "0035_pulp2distributor_pulp3_publication_fingerprint"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="pulp2repository",
+            name="package_checksum_type",
+            field=models.CharField(max_length=10, null=True),
+        ),
+    ]
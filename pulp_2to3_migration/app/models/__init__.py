@@ -5,6 +5,9 @@ from .base import (  # noqa
 from .content import (  # noqa
     Pulp2Content,
     Pulp2LazyCatalog,
+    Pulp2PendingContent,
+    Pulp2SkippedContent,
+    Pulp2StorageCheck,
     Pulp2to3Content,
 )
 from .repository import (  # noqa
@@ -60,6 +60,120 @@ class Pulp2Content(BaseModel):
         indexes = [
             models.Index(fields=["pulp2_content_type_id"]),
             models.Index(fields=["pulp2_last_updated"]),
+            models.Index(
+                fields=["pulp2_content_type_id"],
+                condition=Q(pulp3_content=None),
+                name="pulp2content_not_migrated_idx",
+            ),
+        ]
+
+
+class Pulp2PendingContent(BaseModel):
+    """
+    Work queue of pre-migrated Pulp 2 content of lazy types which needs to be migrated.
+
+    Content is added to the queue at the end of pre-migration and removed from it once it's
+    migrated, so a migration re-run only goes through the content which has changed.
+
+    Fields:
+        pulp2_content_type_id (models.CharField): Content type in Pulp 2
+        reason (models.CharField): Why the content needs to be migrated, one of ``new``
+                                   (not migrated yet), ``new_lce`` (migrated but has new lazy
+                                   catalog entries) or ``retry`` (it was pending already during
+                                   the previous migration run)
+
+    Relations:
+        pulp2content (models.OneToOneField): Pulp 2 content to migrate
+
+    """
+
+    NEW = "new"
+    NEW_LCE = "new_lce"
+    RETRY = "retry"
+    REASON_CHOICES = ((NEW, NEW), (NEW_LCE, NEW_LCE), (RETRY, RETRY))
+
+    pulp2_content_type_id = models.CharField(max_length=255)
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+
+    pulp2content = models.OneToOneField(
+        Pulp2Content, on_delete=models.CASCADE, related_name="pending_migration"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["pulp2_content_type_id"]),
+        ]
+
+
+class Pulp2SkippedContent(BaseModel):
+    """
+    Pulp 2 content which was skipped during migration because its files are missing or corrupted.
+
+    Content is added when it's skipped during a migration with ``skip_corrupted`` and removed
+    once it's migrated, so it can be retried or excluded on the next migration run.
+    The time it was last skipped is ``pulp_last_updated``.
+
+    Fields:
+        pulp2_content_type_id (models.CharField): Content type in Pulp 2
+        pulp2_storage_path (models.TextField): Path to the missing or corrupted file
+        reason (models.CharField): Why the content was skipped, ``missing`` or ``corrupted``
+
+    Relations:
+        pulp2content (models.OneToOneField): Pulp 2 content which was skipped
+
+    """
+
+    MISSING = "missing"
+    CORRUPTED = "corrupted"
+    REASON_CHOICES = ((MISSING, MISSING), (CORRUPTED, CORRUPTED))
+
+    pulp2_content_type_id = models.CharField(max_length=255)
+    pulp2_storage_path = models.TextField()
+    reason = models.CharField(max_length=20, choices=REASON_CHOICES)
+
+    pulp2content = models.OneToOneField(
+        Pulp2Content, on_delete=models.CASCADE, related_name="skipped_migration"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["pulp2_content_type_id"]),
+        ]
+
+
+class Pulp2StorageCheck(BaseModel):
+    """
+    Result of a pre-flight check of the Pulp 2 storage for a downloaded content unit.
+
+    Fields:
+        status (models.CharField): Outcome of the check, one of ``ok``, ``missing`` or
+                                   ``corrupted``
+        checksums_verified (models.BooleanField): Flag to identify if file digests were
+                                                  verified or only its presence and size
+        pulp2_last_updated (models.PositiveIntegerField): Pulp 2 content update time at the
+                                                          moment of the check
+
+    Relations:
+        pulp2content (models.OneToOneField): Pulp 2 content which storage was checked
+
+    """
+
+    OK = "ok"
+    MISSING = "missing"
+    CORRUPTED = "corrupted"
+    STATUS_CHOICES = ((OK, OK), (MISSING, MISSING), (CORRUPTED, CORRUPTED))
+
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES)
+    checksums_verified = models.BooleanField(default=False)
+    pulp2_last_updated = models.PositiveIntegerField()
+
+    pulp2content = models.OneToOneField(
+        Pulp2Content, on_delete=models.CASCADE, related_name="storage_check"
+    )
+
+    class Meta:
+        indexes = [
+            models.Index(fields=["status"]),
         ]
 
 
@@ -115,6 +229,23 @@ class Pulp2to3Content(BaseModel):
         """
         raise NotImplementedError()
 
+    @classmethod
+    def create_pulp3_content_batch(cls, batch):
+        """
+        Create Pulp 3 detail Content units for a batch of pre-migrated content.
+
+        Plugin writers might want to override this method if content can be created more
+        efficiently for many units at once.
+
+        Args:
+            batch(list): pre-migrated content to create Pulp 3 content for
+
+        Returns:
+            list: results of create_pulp3_content() in the same order as the batch
+
+        """
+        return [pulp2to3content.create_pulp3_content() for pulp2to3content in batch]
+
 
 class Pulp2LazyCatalog(BaseModel):
     """
@@ -143,4 +274,5 @@ class Pulp2LazyCatalog(BaseModel):
         indexes = [
             models.Index(fields=["pulp2_unit_id"]),
             models.Index(fields=["pulp2_content_type_id"]),
+            models.Index(fields=["pulp2_content_type_id", "is_migrated"]),
         ]
@@ -28,6 +28,8 @@ class Pulp2Repository(BaseModel):
             if it's never been migrated or if it's been updated since the last migration run.
         not_in_plan (models.BooleanField): True if a resource is not a part of the migration plan.
         pulp2_repo_type (models.CharField): repo type in Pulp 2
+        package_checksum_type (models.CharField): The most common checksum type of the packages
+            in a repository, if a plugin needs it to publish the repository
 
     Relations:
         pulp3_repository_version (models.ForeignKey): Pulp 3 repository version which Pulp 2
@@ -43,6 +45,7 @@ class Pulp2Repository(BaseModel):
     is_migrated = models.BooleanField(default=False)
     not_in_plan = models.BooleanField(default=False)
     pulp2_repo_type = models.CharField(max_length=25)
+    package_checksum_type = models.CharField(max_length=10, null=True)
 
     # This needs to be a foreign key to cover a case when repository in pulp 2 was removed after
     # a migration run and then recreated with exactly the same name and content in pulp 2,
@@ -148,6 +151,8 @@ class Pulp2Distributor(BaseModel):
         is_migrated (models.BooleanField): True if a resource has been migrated to Pulp 3; False
             if it's never been migrated or if it's been updated since the last migration run.
         not_in_plan (models.BooleanField): True if a resource is not a part of the migration plan.
+        pulp3_publication_fingerprint (models.CharField): Fingerprint of the content and publish
+            options of the Pulp 3 publication, to reuse it for identical repository versions
 
     Relations:
         pulp2_repos (models.ManyToManyField): Pulp 2 repository that is getting distributed
@@ -165,6 +170,7 @@ class Pulp2Distributor(BaseModel):
     pulp2_repo_id = models.TextField()
     is_migrated = models.BooleanField(default=False)
     not_in_plan = models.BooleanField(default=False)
+    pulp3_publication_fingerprint = models.CharField(max_length=64, null=True)
 
     # each pulp2 repository can have multiple distributors
     pulp2_repos = models.ManyToManyField(Pulp2Repository, related_name="pulp2_dists")
@@ -182,4 +188,5 @@ class Pulp2Distributor(BaseModel):
             models.Index(fields=["pulp2_type_id"]),
             models.Index(fields=["pulp2_last_updated"]),
             models.Index(fields=["pulp2_repo_id"]),
+            models.Index(fields=["pulp3_publication_fingerprint"]),
         ]
@@ -0,0 +1,282 @@
+import errno
+import fcntl
+import logging
+import os
+import shutil
+import tempfile
+
+from concurrent.futures import ThreadPoolExecutor
+from gettext import gettext as _
+
+from django.conf import settings
+
+from pulpcore.app import pulp_hashlib
+from pulpcore.app.models import storage
+from pulpcore.plugin.exceptions import (
+    DigestValidationError,
+    SizeValidationError,
+    UnsupportedDigestValidationError,
+)
+from pulpcore.plugin.models import Artifact
+
+_logger = logging.getLogger(__name__)
+
+# ioctl request to share the data blocks of one file with another one, see ioctl_ficlone(2)
+FICLONE = 0x40049409
+COPY_CHUNK_SIZE = 1024 * 1024
+
+_copy_executor = None
+# directories in the Pulp 3 storage which are known to exist
+_created_dirs = set()
+# None means it's not known yet if hard links between Pulp 2 and Pulp 3 storage can be created
+_hardlinks_supported = None
+
+
+def get_copy_executor():
+    """
+    Return a process-wide executor to place artifacts into the Pulp 3 storage.
+
+    The number of files processed in parallel is limited by the ``CONTENT_COPY_WORKERS`` setting.
+
+    Returns:
+        concurrent.futures.ThreadPoolExecutor: the executor for the file operations
+
+    """
+    global _copy_executor
+    if _copy_executor is None:
+        _copy_executor = ThreadPoolExecutor(
+            max_workers=settings.CONTENT_COPY_WORKERS, thread_name_prefix="pulp2to3-copy"
+        )
+    return _copy_executor
+
+
+def ensure_dir(path):
+    """
+    Create a directory in the Pulp 3 storage unless it's known to exist already.
+
+    Args:
+        path(str): Path to the directory
+
+    """
+    if path not in _created_dirs:
+        os.makedirs(path, exist_ok=True)
+        _created_dirs.add(path)
+
+
+def in_created_dir(path, operation, *args, **kwargs):
+    """
+    Run a file operation which creates a file in a directory created with ``ensure_dir``.
+
+    If the directory has been removed since it was created, e.g. by orphan cleanup, it's created
+    again and the operation is retried once.
+
+    Args:
+        path(str): Path to the directory
+        operation(callable): The file operation to run
+        args: Positional arguments for the operation
+        kwargs: Keyword arguments for the operation
+
+    Returns:
+        The result of the operation
+
+    """
+    try:
+        return operation(*args, **kwargs)
+    except FileNotFoundError:
+        if os.path.isdir(path):
+            # the directory is fine, something else is missing
+            raise
+        _created_dirs.discard(path)
+        ensure_dir(path)
+        return operation(*args, **kwargs)
+
+
+def precreate_artifact_dirs():
+    """
+    Create all the directories for artifacts in the Pulp 3 storage.
+
+    Artifacts are stored in the directories named after the first two characters of their sha256
+    digest, so there are at most 256 of them.
+    """
+    artifact_dir = os.path.join(settings.MEDIA_ROOT, "artifact")
+    for prefix in range(256):
+        ensure_dir(os.path.join(artifact_dir, "{:02x}".format(prefix)))
+
+
+def reflink(src, dst):
+    """
+    Create a copy-on-write clone of a file, if the filesystem supports it.
+
+    Args:
+        src(str): Path to the source file
+        dst(str): Path to the destination file, it is truncated if it exists
+
+    Returns:
+        bool: True if the file has been cloned, False otherwise
+
+    """
+    try:
+        with open(src, "rb") as src_fp, open(dst, "wb") as dst_fp:
+            fcntl.ioctl(dst_fp.fileno(), FICLONE, src_fp.fileno())
+    except OSError:
+        return False
+    return True
+
+
+def copy_and_hash(src, dst, hashers):
+    """
+    Copy a file and calculate its digests in the same pass.
+
+    If the file can be cloned, the data is not copied, only read once to calculate the digests.
+
+    Args:
+        src(str): Path to the source file
+        dst(str): Path to the destination file
+        hashers(dict): Keyed on the algorithm name, hashers to update with the file data
+
+    Returns:
+        int: Size of the file in bytes
+
+    """
+    size = 0
+    if reflink(src, dst):
+        with open(dst, "rb") as dst_fp:
+            for chunk in iter(lambda: dst_fp.read(COPY_CHUNK_SIZE), b""):
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+                size += len(chunk)
+    else:
+        with open(src, "rb") as src_fp, open(dst, "wb") as dst_fp:
+            for chunk in iter(lambda: src_fp.read(COPY_CHUNK_SIZE), b""):
+                dst_fp.write(chunk)
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+                size += len(chunk)
+    shutil.copystat(src, dst)
+    return size
+
+
+def copy_artifact(pulp2_storage_path, expected_digests=None, expected_size=None):
+    """
+    Copy a file into the Pulp 3 storage and create an Artifact for it.
+
+    The file is copied to a temporary location in the Pulp 3 storage first, its digests are
+    calculated during the copy and only after a successful validation the file is moved to its
+    final location.
+
+    Args:
+        pulp2_storage_path(str): Path to the file in the Pulp 2 storage
+        expected_digests(dict): Keyed on the algorithm name, the expected digests
+        expected_size(int): The number of bytes the file is expected to have
+
+    Returns:
+        pulpcore.plugin.models.Artifact: An unsaved artifact, its file is in the Pulp 3 storage
+
+    Raises:
+        DigestValidationError: When any of the ``expected_digest`` values don't match
+        SizeValidationError: When the ``expected_size`` value doesn't match
+        UnsupportedDigestValidationError: When any of the ``expected_digest`` algorithms aren't
+                                          allowed
+        FileNotFoundError: When the file is missing in the Pulp 2 storage
+
+    """
+    expected_digests = expected_digests or {}
+    for algorithm in expected_digests:
+        if algorithm not in Artifact.DIGEST_FIELDS:
+            raise UnsupportedDigestValidationError(
+                _("Checksum algorithm {} forbidden for this Pulp instance.").format(algorithm)
+            )
+
+    artifact_dir = os.path.join(settings.MEDIA_ROOT, "artifact")
+    ensure_dir(artifact_dir)
+    fd, tmp_path = in_created_dir(
+        artifact_dir, tempfile.mkstemp, dir=artifact_dir, prefix=".pulp2to3-"
+    )
+    os.close(fd)
+    try:
+        hashers = {name: pulp_hashlib.new(name) for name in Artifact.DIGEST_FIELDS}
+        size = copy_and_hash(pulp2_storage_path, tmp_path, hashers)
+
+        if expected_size and size != expected_size:
+            raise SizeValidationError()
+        digests = {name: hasher.hexdigest() for name, hasher in hashers.items()}
+        for algorithm, expected_digest in expected_digests.items():
+            if expected_digest != digests[algorithm]:
+                raise DigestValidationError()
+
+        pulp3_storage_path = os.path.join(
+            settings.MEDIA_ROOT, storage.get_artifact_path(digests["sha256"])
+        )
+        pulp3_storage_dir = os.path.dirname(pulp3_storage_path)
+        ensure_dir(pulp3_storage_dir)
+        in_created_dir(pulp3_storage_dir, os.replace, tmp_path, pulp3_storage_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return Artifact(size=size, file=pulp3_storage_path, **digests)
+
+
+def place_artifact(pulp2_storage_path, expected_digests=None, expected_size=None, digests=None):
+    """
+    Place a file from the Pulp 2 storage into the Pulp 3 storage and create an Artifact for it.
+
+    A hard link is created if possible, otherwise the file is copied.
+    Once it's known that hard links can't be created because Pulp 2 and Pulp 3 storage are on
+    different filesystems, files are copied right away, without being read beforehand.
+
+    Args:
+        pulp2_storage_path(str): Path to the file in the Pulp 2 storage
+        expected_digests(dict): Keyed on the algorithm name, the expected digests
+        expected_size(int): The number of bytes the file is expected to have
+        digests(dict): Keyed on the algorithm name, all the digests of the file if they have
+                       been calculated already. The file is not read again to create a hard link.
+
+    Returns:
+        pulpcore.plugin.models.Artifact: An unsaved artifact, its file is in the Pulp 3 storage
+
+    """
+    global _hardlinks_supported
+
+    if _hardlinks_supported is False:
+        return copy_artifact(pulp2_storage_path, expected_digests or digests, expected_size)
+
+    if digests:
+        size = os.stat(pulp2_storage_path).st_size
+        if expected_size and size != expected_size:
+            raise SizeValidationError()
+        artifact = Artifact(size=size, file=pulp2_storage_path, **digests)
+    else:
+        artifact = Artifact.init_and_validate(
+            pulp2_storage_path,
+            expected_digests=expected_digests,
+            expected_size=expected_size,
+        )
+    pulp3_storage_path = os.path.join(
+        settings.MEDIA_ROOT, storage.get_artifact_path(artifact.sha256)
+    )
+    pulp3_storage_dir = os.path.dirname(pulp3_storage_path)
+    ensure_dir(pulp3_storage_dir)
+
+    try:
+        in_created_dir(pulp3_storage_dir, os.link, pulp2_storage_path, pulp3_storage_path)
+    except FileExistsError:
+        pass
+    except OSError as exc:
+        if exc.errno == errno.EXDEV:
+            _hardlinks_supported = False
+        _logger.debug(_("Hard link cannot be created, file will be copied."))
+        # the file is validated again after being copied to ensure that it's still fine
+        return copy_artifact(
+            pulp2_storage_path,
+            expected_digests or {"sha256": artifact.sha256},
+            expected_size,
+        )
+    else:
+        _hardlinks_supported = True
+
+    # a hard link has been created or a file has already been in the pulp 3 storage, so
+    # artifact's path can be just updated and no checksum recalculation is needed.
+    artifact.file = pulp3_storage_path
+    return artifact
@@ -1,19 +1,17 @@
 import asyncio
+import collections
 import functools
 import logging
 import os
-import shutil
+import time
 
 from gettext import gettext as _
 
 from asgiref.sync import sync_to_async
 
 from django.conf import settings
-from django.core.exceptions import ObjectDoesNotExist
 from django.db import transaction
-from django.db.models.expressions import RawSQL
 
-from pulpcore.app.models import storage
 from pulpcore.plugin.exceptions import DigestValidationError, SizeValidationError
 from pulpcore.plugin.models import (
     Artifact,
@@ -36,12 +34,23 @@ from pulpcore.plugin.sync import sync_to_async_iterable
 from pulp_2to3_migration.app.constants import (
     DEFAULT_BATCH_SIZE,
     NOT_USED,
+    SKIPPED_CONTENT_EXCLUDE,
+    SKIPPED_CONTENT_INCLUDE,
+    SKIPPED_CONTENT_ONLY,
 )
 from pulp_2to3_migration.app.models import (
     Pulp2Content,
     Pulp2Importer,
     Pulp2LazyCatalog,
+    Pulp2PendingContent,
+    Pulp2SkippedContent,
 )
+from pulp_2to3_migration.app.plugin.artifact_storage import (
+    get_copy_executor,
+    place_artifact,
+)
+from pulp_2to3_migration.app.plugin.instrumentation import PipelineInstrumentation
+from pulp_2to3_migration.app.storage_check import failed_storage_checks
 from pulp_2to3_migration.exceptions import ArtifactValidationError
 
 _logger = logging.getLogger(__name__)
@@ -86,11 +95,64 @@ class DeclarativeContentMigration:
     async def create(self):
         """
         Perform the work specified by pipeline.
+
+        If the ``CONTENT_MIGRATION_INSTRUMENTATION`` setting is enabled, statistics are collected
+        for every stage and reported at the end of the migration.
         """
+        pipeline_config = self.get_pipeline_config()
+        maxsize = pipeline_config.get("maxsize", 1)
         stages = self.pipeline_stages()
+        self.configure_stages(stages, pipeline_config)
+        if not settings.CONTENT_MIGRATION_INSTRUMENTATION:
+            stages.append(EndStage())
+            await create_pipeline(stages, maxsize=maxsize)
+            return
+
+        instrumentation = PipelineInstrumentation(stages)
         stages.append(EndStage())
-        pipeline = create_pipeline(stages)
-        await pipeline
+        async with instrumentation:
+            await create_pipeline(stages, maxsize=maxsize)
+        await sync_to_async(instrumentation.report)(self.first_stage.migrator.pulp2_plugin)
+
+    def get_pipeline_config(self):
+        """
+        Return the pipeline configuration for the plugin which content is being migrated.
+
+        It's defined in the ``CONTENT_MIGRATION_PIPELINE`` setting, keyed on the Pulp 2 plugin name.
+
+        Returns:
+            dict: ``maxsize`` of the queues between the stages, ``batch_size`` for all the
+                  stages and ``stage_batch_sizes`` keyed on the stage class name. Each of them
+                  is optional, pulpcore defaults are used if not set.
+
+        """
+        plugin = self.first_stage.migrator.pulp2_plugin
+        return settings.CONTENT_MIGRATION_PIPELINE.get(plugin, {})
+
+    @staticmethod
+    def configure_stages(stages, pipeline_config):
+        """
+        Set batch sizes of the stages according to the pipeline configuration.
+
+        A batch size is the minimum number of items a stage waits for before processing them,
+        unless the input queue is exhausted. Stages which run their own bulk DB operations
+        use it as the max number of objects per query as well.
+
+        Args:
+            stages(list): List of :class:`~pulpcore.plugin.stages.Stage` instances, they should
+                          not be connected yet
+            pipeline_config(dict): Pipeline configuration, see ``get_pipeline_config``
+
+        """
+        default_batch_size = pipeline_config.get("batch_size")
+        stage_batch_sizes = pipeline_config.get("stage_batch_sizes", {})
+        for stage in stages:
+            batch_size = stage_batch_sizes.get(stage.__class__.__name__, default_batch_size)
+            if not batch_size:
+                continue
+            stage.batches = functools.partial(stage.batches, minsize=batch_size)
+            if hasattr(stage, "batch_size"):
+                stage.batch_size = batch_size
 
 
 class ContentMigrationFirstStage(Stage):
@@ -101,14 +163,27 @@ class ContentMigrationFirstStage(Stage):
     being migrated.
     """
 
-    def __init__(self, migrator, skip_corrupted=False):
+    def __init__(
+        self, migrator, skip_corrupted=False, shard=None, skipped_content=SKIPPED_CONTENT_INCLUDE
+    ):
         """
         Args:
             migrator: A plugin migrator to be used
+            skip_corrupted (bool): If True, corrupted content is skipped during migration,
+                                   no task failure. Skipped content is recorded as
+                                   Pulp2SkippedContent.
+            shard (dict): Only a part of the content to migrate, it's used when content migration
+                          is split into multiple tasks. ``content_types`` are the content types to
+                          migrate, ``pulp2content_range`` is a lower (included) and an upper
+                          (excluded) bound of Pulp2Content pks, None means not bounded.
+            skipped_content (str): Whether to migrate content skipped during previous migration
+                                   runs, ``include``, ``only`` or ``exclude`` it.
         """
         super().__init__()
         self.migrator = migrator
         self.skip_corrupted = skip_corrupted
+        self.shard = shard
+        self.skipped_content = skipped_content
 
     async def create_artifact(
         self,
@@ -116,12 +191,19 @@ class ContentMigrationFirstStage(Stage):
         expected_digests={},
         expected_size=None,
         downloaded=True,
+        digests=None,
+        pulp2content=None,
     ):
         """
         Create a hard link if possible and then create an Artifact.
 
         If it's not possible to create a hard link, file is copied to the Pulp 3 storage.
+        Files are placed into the Pulp 3 storage in a separate thread pool, so the event loop
+        is not blocked by the I/O.
         For non-downloaded content, artifact with its expected checksum and size is created.
+        If all the ``digests`` of the file are known already, the file is not hashed again.
+        If the file is missing or corrupted and it's allowed to skip it, ``pulp2content`` is
+        recorded as skipped.
         """
         if not downloaded:
             if not expected_digests:
@@ -136,17 +218,35 @@ class ContentMigrationFirstStage(Stage):
             return artifact
 
         try:
-            artifact = Artifact.init_and_validate(
-                pulp2_storage_path,
-                expected_digests=expected_digests,
-                expected_size=expected_size,
+            artifact = await asyncio.get_event_loop().run_in_executor(
+                get_copy_executor(),
+                functools.partial(
+                    place_artifact,
+                    pulp2_storage_path,
+                    expected_digests=expected_digests,
+                    expected_size=expected_size,
+                    digests=digests,
+                ),
             )
-        except (DigestValidationError, FileNotFoundError, SizeValidationError):
+        except (DigestValidationError, FileNotFoundError, SizeValidationError) as exc:
             if self.skip_corrupted:
                 _logger.warn(
                     f"The content located in {pulp2_storage_path} is missing or "
                     f"corrupted. It was skipped during Pulp 2to3 migration."
                 )
+                if pulp2content is not None:
+                    if isinstance(exc, FileNotFoundError):
+                        reason = Pulp2SkippedContent.MISSING
+                    else:
+                        reason = Pulp2SkippedContent.CORRUPTED
+                    await sync_to_async(Pulp2SkippedContent.objects.update_or_create)(
+                        pulp2content=pulp2content,
+                        defaults={
+                            "pulp2_content_type_id": pulp2content.pulp2_content_type_id,
+                            "pulp2_storage_path": pulp2_storage_path,
+                            "reason": reason,
+                        },
+                    )
                 return
             raise ArtifactValidationError(
                 f"The content located in {pulp2_storage_path} is "
@@ -155,50 +255,150 @@ class ContentMigrationFirstStage(Stage):
                 f"skip_corrupted=True."
             )
 
-        pulp3_storage_relative_path = storage.get_artifact_path(artifact.sha256)
-        pulp3_storage_path = os.path.join(settings.MEDIA_ROOT, pulp3_storage_relative_path)
-        os.makedirs(os.path.dirname(pulp3_storage_path), exist_ok=True)
+        return artifact
 
-        is_copied = False
-        try:
-            os.link(pulp2_storage_path, pulp3_storage_path)
-        except FileExistsError:
-            pass
-        except OSError:
-            _logger.debug(_("Hard link cannot be created, file will be copied."))
-            shutil.copy2(pulp2_storage_path, pulp3_storage_path)
-            is_copied = True
-
-        if not expected_digests:
-            expected_digests = {"sha256": artifact.sha256}
-
-        if is_copied:
-            # recalculate checksums to ensure that after being copied a file is still fine
-            artifact = Artifact.init_and_validate(
-                file=pulp3_storage_path,
-                expected_digests=expected_digests,
-                expected_size=expected_size,
-            )
-        else:
-            # a hard link has been created or a file has already been in the pulp 3 storage, so
-            # artifact's path can be just updated and no checksum recalculation is needed.
-            artifact.file = pulp3_storage_path
+    async def create_image_artifacts(
+        self, pulp2content, image_relative_paths, pulp2lazycatalog, remotes_by_importer_id
+    ):
+        """
+        Create declarative artifacts for the images of a multi-artifact content, e.g. a
+        distribution tree.
 
-        return artifact
+        Args:
+            pulp2content(Pulp2Content): Pulp 2 content the images belong to
+            image_relative_paths(list): paths of the images relative to the storage path of
+                                        the content
+            pulp2lazycatalog: lazy catalog entries of the content
+            remotes_by_importer_id(dict): Pulp 3 remotes keyed on the ids of the corresponding
+                                          importers in Pulp 2
+
+        Returns:
+            tuple: a list of DeclarativeArtifacts, a set of remotes the images can be downloaded
+                   from and a flag if any on_demand image has no migrated remote; None if any
+                   downloaded image is missing or corrupted and it's allowed to skip it
+
+        """
+        d_artifacts = []
+        base_path = pulp2content.pulp2_storage_path
+        remotes = set()
+        missing_artifact = False
+        remote_declarative_artifacts = []
+
+        image_paths = [
+            os.path.join(base_path, image_relative_path)
+            for image_relative_path in image_relative_paths
+        ]
+        # images are big and often on a network storage, check them all at once
+        loop = asyncio.get_event_loop()
+        images_downloaded = await asyncio.gather(
+            *[
+                loop.run_in_executor(get_copy_executor(), os.path.exists, image_path)
+                for image_path in image_paths
+            ]
+        )
+
+        for image_relative_path, image_path, downloaded in zip(
+            image_relative_paths, image_paths, images_downloaded
+        ):
+            remote_url_tuples = []
+            if downloaded:
+                artifact = await self.create_artifact(
+                    image_path,
+                    None,
+                    None,
+                    downloaded=downloaded,
+                    pulp2content=pulp2content,
+                )
+                if artifact is None:
+                    return
+            else:
+                artifact = Artifact()
+
+            lces = await sync_to_async(list)(pulp2lazycatalog.filter(pulp2_storage_path=image_path))
+
+            if not lces and not downloaded:
+                continue
+
+            # collect all urls and respective migrated remotes for the image
+            for lce in lces:
+                remote = remotes_by_importer_id.get(lce.pulp2_importer_id)
+                if remote:
+                    remotes.add(remote)
+                    remote_url_tuples.append((remote, lce.pulp2_url))
+
+            for remote, url in remote_url_tuples:
+                da = DeclarativeArtifact(
+                    artifact=artifact,
+                    url=lce.pulp2_url,
+                    relative_path=image_relative_path,
+                    remote=remote,
+                    deferred_download=not downloaded,
+                )
+                remote_declarative_artifacts.append(da)
+
+            if not remote_url_tuples:
+                # either no LCEs existed but it's a downloaded content (and we can
+                # proceed), or remotes for any of LCEs haven't been migrated (and
+                # nothing can be done at this point)
+                if not downloaded:
+                    missing_artifact = True
+                    break
+
+                da = DeclarativeArtifact(
+                    artifact=artifact,
+                    url=NOT_USED,
+                    relative_path=image_relative_path,
+                    remote=None,
+                    deferred_download=False,
+                )
+                d_artifacts.append(da)
+
+            d_artifacts.extend(remote_declarative_artifacts)
+
+        return d_artifacts, remotes, missing_artifact
 
     async def run(self):
         """
         Schedules multiple coroutines to migrate pre-migrated content to Pulp 3
 
-        It migrates content type by type.
+        Content types are migrated concurrently, unless they depend on each other. A content type
+        is migrated only after all the content types it depends on, see
+        ``content_type_dependencies`` of the migrator.
         If a plugin needs to have more control over the order of content migration, it should
         override this method.
         """
-        for ctype, cmodel in self.migrator.content_models.items():
-            # We are waiting on the coroutine to finish, because the order of the processed
-            # content for plugins like Container and RPM is important because of the relations
-            # between the content types.
-            await asyncio.gather(self.migrate_to_pulp3(cmodel, ctype))
+        content_models = self.migrator.content_models
+        if self.shard:
+            content_models = {
+                ctype: cmodel
+                for ctype, cmodel in content_models.items()
+                if ctype in self.shard["content_types"]
+            }
+        dependencies = self.migrator.get_content_type_dependencies()
+        migrated = {ctype: asyncio.Event() for ctype in content_models}
+
+        async def migrate_content_type(ctype, cmodel):
+            # The order of the processed content for plugins like Container and RPM is important
+            # because of the relations between the content types. All the content of the
+            # prerequisites is put into the pipeline before the dependent content.
+            for dependency in dependencies.get(ctype, []):
+                if dependency in migrated:
+                    await migrated[dependency].wait()
+            await self.migrate_to_pulp3(cmodel, ctype)
+            migrated[ctype].set()
+
+        tasks = [
+            asyncio.ensure_future(migrate_content_type(ctype, cmodel))
+            for ctype, cmodel in content_models.items()
+        ]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            # content types which wait for the failed one would wait forever, stop all of them
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
 
     async def migrate_to_pulp3(self, content_model, content_type):
         """
@@ -214,52 +414,103 @@ class ContentMigrationFirstStage(Stage):
             content_type: type of pulp2 content that is being mirated
         """
 
-        @functools.lru_cache(maxsize=20)
-        def get_remote_by_importer_id(importer_id):
+        def get_remotes_by_importer_id():
+            """
+            Returns:
+                dict: Pulp 3 remotes keyed on the ids of the corresponding importers in Pulp 2
+
+            """
+            pulp2importers = Pulp2Importer.objects.filter(pulp3_remote__isnull=False)
+            return {
+                pulp2importer.pulp2_object_id: pulp2importer.pulp3_remote
+                for pulp2importer in pulp2importers.select_related("pulp3_remote")
+            }
+
+        def precreate_pulp3_content(pulp_2to3_detail_qs, chunk_size=800):
             """
+            Create Pulp 3 content in batches for the content which hasn't been migrated yet.
+
             Args:
-                importer_id(str): Id of an importer in Pulp 2
+                pulp_2to3_detail_qs: pre-migrated detail content to iterate over
+                chunk_size(int): the number of content units to create Pulp 3 content for at once
 
-            Returns:
-                remote(pulpcore.app.models.Remote): A corresponding remote in Pulp 3
+            Yields:
+                tuple: pre-migrated detail content and the result of its
+                       create_pulp3_content() or None if it hasn't been created in advance
 
             """
-            try:
-                pulp2importer = Pulp2Importer.objects.get(pulp2_object_id=importer_id)
-            except ObjectDoesNotExist:
-                return
-            return pulp2importer.pulp3_remote
+
+            def create_chunk(chunk):
+                to_create = [
+                    detail for detail in chunk if detail.pulp2content.pulp3_content_id is None
+                ]
+                created = dict(
+                    zip(
+                        [detail.pk for detail in to_create],
+                        content_model.create_pulp3_content_batch(to_create),
+                    )
+                )
+                for detail in chunk:
+                    yield detail, created.get(detail.pk)
+
+            chunk = []
+            for detail in pulp_2to3_detail_qs.iterator(chunk_size=chunk_size):
+                chunk.append(detail)
+                if len(chunk) >= chunk_size:
+                    yield from create_chunk(chunk)
+                    chunk = []
+            yield from create_chunk(chunk)
 
         futures = []
+        min_batch_size = self.migrator.futures_batch_min_size
+        max_batch_size = self.migrator.futures_batch_max_size
+        futures_batch_size = min_batch_size
+        futures_wait_time = 0
+        futures_waits = 0
+        futures_batch_start = time.monotonic()
         is_lazy_type = content_type in self.migrator.lazy_types
         is_artifactless_type = content_type in self.migrator.artifactless_types
         has_future = content_type in self.migrator.future_types
         is_multi_artifact = content_type in self.migrator.multi_artifact_types
 
         if is_lazy_type:
-            # go through all of the content that haven't been migrated OR have been migrated
-            # but have new lazy catalog entries.
-            content_model_table = content_model._meta.db_table
-            query = f"""
-                SELECT DISTINCT {content_model_table}.pulp_id
-                  FROM {content_model_table}
-                  INNER JOIN pulp_2to3_migration_pulp2content ON
-                    ({content_model_table}.pulp2content_id =
-                     pulp_2to3_migration_pulp2content.pulp_id
-                    AND pulp_2to3_migration_pulp2content.pulp2_content_type_id = %s)
-                  LEFT JOIN pulp_2to3_migration_pulp2lazycatalog ON
-                    (pulp_2to3_migration_pulp2content.pulp2_id =
-                     pulp_2to3_migration_pulp2lazycatalog.pulp2_unit_id)
-                WHERE NOT (NOT (pulp_2to3_migration_pulp2content.pulp3_content_id IS NULL)
-                  AND NOT (pulp_2to3_migration_pulp2lazycatalog.is_migrated = false))
-            """
+            # go through the queue of the content that haven't been migrated OR have been
+            # migrated but have new lazy catalog entries, it's populated during pre-migration.
             pulp_2to3_detail_qs = content_model.objects.filter(
-                pulp_id__in=RawSQL(query, (content_type,))
+                pulp2content__pending_migration__pulp2_content_type_id=content_type
             )
         else:
             # go through all of the content that haven't been migrated
             pulp_2to3_detail_qs = content_model.objects.filter(pulp2content__pulp3_content=None)
 
+        if self.shard:
+            lower_bound, upper_bound = self.shard["pulp2content_range"]
+            if lower_bound:
+                pulp_2to3_detail_qs = pulp_2to3_detail_qs.filter(pulp2content__pk__gte=lower_bound)
+            if upper_bound:
+                pulp_2to3_detail_qs = pulp_2to3_detail_qs.filter(pulp2content__pk__lt=upper_bound)
+
+        if self.skipped_content == SKIPPED_CONTENT_ONLY:
+            pulp_2to3_detail_qs = pulp_2to3_detail_qs.filter(
+                pulp2content__skipped_migration__isnull=False
+            )
+        elif self.skipped_content == SKIPPED_CONTENT_EXCLUDE:
+            pulp_2to3_detail_qs = pulp_2to3_detail_qs.filter(
+                pulp2content__skipped_migration__isnull=True
+            )
+
+        if self.skip_corrupted and not is_artifactless_type:
+            # no need to validate content which is already known to be missing or corrupted
+            pulp_2to3_detail_qs = pulp_2to3_detail_qs.exclude(
+                pulp2content__in=failed_storage_checks([content_type])
+            )
+
+        # the number of importers is small, it's cheaper to get all of them at once than to
+        # query them per lazy catalog entry
+        remotes_by_importer_id = {}
+        if is_lazy_type:
+            remotes_by_importer_id = await sync_to_async(get_remotes_by_importer_id)()
+
         # order by pulp2_repo if it's set
         if content_model.set_pulp2_repo:
             pulp_2to3_detail_qs = pulp_2to3_detail_qs.order_by("repo_id")
@@ -278,10 +529,18 @@ class ContentMigrationFirstStage(Stage):
                 select_extra.append("pulp2content__pulp2_repo")
 
             pulp_2to3_detail_qs = pulp_2to3_detail_qs.select_related(*select_extra)
-            async for pulp_2to3_detail_content in sync_to_async_iterable(
-                pulp_2to3_detail_qs.iterator(chunk_size=800)
-            ):
-                dc = None
+
+            async def migrate_content(pulp_2to3_detail_content, precreated):
+                """
+                Create DeclarativeContent for a pre-migrated content unit.
+
+                Returns:
+                    list: DeclarativeContent to put into the pipeline, it's empty if the content
+                          is missing or corrupted and skipped; None if the content is not
+                          migrated for any other reason
+
+                """
+                dcs = []
                 pulp2content = await sync_to_async(Pulp2Content.objects.get)(
                     pk=pulp_2to3_detail_content.pulp2content.pk
                 )
@@ -305,14 +564,16 @@ class ContentMigrationFirstStage(Stage):
                                     "lazy catalog, pulp2 unit_id: {}".format(pulp2content.pulp2_id)
                                 )
                             )
-                            continue
+                            return
 
                 if pulp2content.pulp3_content is not None and is_lazy_type and pulp2lazycatalog:
                     # find already created pulp3 content
                     pulp3content = pulp2content.pulp3_content
                     extra_info = None
                     if is_multi_artifact:
-                        extra_info = pulp_2to3_detail_content.get_treeinfo_serialized()
+                        extra_info = await sync_to_async(
+                            pulp_2to3_detail_content.get_treeinfo_serialized
+                        )()
                         # If we can't find the .treeinfo for the Distribution, warn and skip
                         if extra_info is None:
                             _logger.warning(
@@ -321,7 +582,9 @@ class ContentMigrationFirstStage(Stage):
                                     "pulp2 unit_id: {} ; skipping".format(pulp2content.pulp2_id)
                                 )
                             )
-                            continue
+                            return
+                elif precreated is not None:
+                    pulp3content, extra_info = precreated
                 else:
                     # create pulp3 content and assign relations if present
                     pulp3content, extra_info = await sync_to_async(
@@ -336,88 +599,37 @@ class ContentMigrationFirstStage(Stage):
                             " skipping".format(pulp2content.pulp2_id)
                         )
                     )
-                    continue
+                    return
 
                 future_relations = {"pulp2content": pulp2content}
                 if extra_info:
                     future_relations.update(extra_info)
 
                 if is_multi_artifact:
-                    d_artifacts = []
-                    base_path = pulp2content.pulp2_storage_path
-                    remotes = set()
-                    missing_artifact = False
-                    remote_declarative_artifacts = []
-
-                    for image_relative_path in extra_info["download"]["images"]:
-                        remote_url_tuples = []
-                        image_path = os.path.join(base_path, image_relative_path)
-                        downloaded = os.path.exists(image_path)
-                        if downloaded:
-                            artifact = await self.create_artifact(
-                                image_path, None, None, downloaded=downloaded
-                            )
-                            if artifact is None:
-                                continue
-                        else:
-                            artifact = Artifact()
-
-                        lces = await sync_to_async(list)(
-                            pulp2lazycatalog.filter(pulp2_storage_path=image_path)
-                        )
-
-                        if not lces and not downloaded:
-                            continue
-
-                        # collect all urls and respective migrated remotes for the image
-                        for lce in lces:
-                            remote = await sync_to_async(get_remote_by_importer_id)(
-                                lce.pulp2_importer_id
-                            )
-                            if remote:
-                                remotes.add(remote)
-                                remote_url_tuples.append((remote, lce.pulp2_url))
-
-                        for remote, url in remote_url_tuples:
-                            da = DeclarativeArtifact(
-                                artifact=artifact,
-                                url=lce.pulp2_url,
-                                relative_path=image_relative_path,
-                                remote=remote,
-                                deferred_download=not downloaded,
-                            )
-                            remote_declarative_artifacts.append(da)
-
-                        if not remote_url_tuples:
-                            # either no LCEs existed but it's a downloaded content (and we can
-                            # proceed), or remotes for any of LCEs haven't been migrated (and
-                            # nothing can be done at this point)
-                            if not downloaded:
-                                missing_artifact = True
-                                break
-
-                            da = DeclarativeArtifact(
-                                artifact=artifact,
-                                url=NOT_USED,
-                                relative_path=image_relative_path,
-                                remote=None,
-                                deferred_download=False,
-                            )
-                            d_artifacts.append(da)
-
-                        d_artifacts.extend(remote_declarative_artifacts)
+                    image_relative_paths = extra_info["download"]["images"]
+                    image_artifacts = await self.create_image_artifacts(
+                        pulp2content,
+                        image_relative_paths,
+                        pulp2lazycatalog,
+                        remotes_by_importer_id,
+                    )
+                    if image_artifacts is None:
+                        # an image is missing or corrupted, a distribution tree is not migrated
+                        # partially, so it stays pending and is recorded as skipped
+                        return dcs
+                    d_artifacts, remotes, missing_artifact = image_artifacts
 
                     # Only skip the rest of the steps if there are any images that are expected
                     # to be downloaded. There are distribution trees without images in the wild,
                     # e.g. CentOS 8 High Availability.
-                    if missing_artifact and extra_info["download"]["images"]:
+                    if missing_artifact and image_relative_paths:
                         _logger.warn(
                             _(
                                 "On_demand content cannot be migrated without a remote "
                                 "pulp2 unit_id: {}".format(pulp2content.pulp2_id)
                             )
                         )
-                        continue
+                        return
 
                     for lce in pulp2lazycatalog:
                         lce.is_migrated = True
@@ -427,11 +639,20 @@ class ContentMigrationFirstStage(Stage):
                     # of the image files. There is no LCE for the .treeinfo file itself.
                     relative_path = pulp_2to3_detail_content.relative_path_for_content_artifact
                     treeinfo_path = os.path.join(pulp2content.pulp2_storage_path, relative_path)
+                    # the treeinfo has been read and hashed already to create the content
+                    treeinfo_digests = await sync_to_async(
+                        pulp_2to3_detail_content.get_treeinfo_digests
+                    )()
                     artifact = await self.create_artifact(
-                        treeinfo_path, None, None, downloaded=True
+                        treeinfo_path,
+                        None,
+                        None,
+                        downloaded=True,
+                        digests=treeinfo_digests,
+                        pulp2content=pulp2content,
                     )
                     if artifact is None:
-                        continue
+                        return
                     if remotes:
                         for remote in remotes:
                             da = DeclarativeArtifact(
@@ -453,13 +674,13 @@ class ContentMigrationFirstStage(Stage):
                         d_artifacts.append(da)
                     dc = DeclarativeContent(content=pulp3content, d_artifacts=d_artifacts)
                     dc.extra_data = future_relations
-                    await self.put(dc)
+                    dcs.append(dc)
                 # not all content units have files, create DC without artifact
                 elif is_artifactless_type:
                     # dc without artifact
                     dc = DeclarativeContent(content=pulp3content)
                     dc.extra_data = future_relations
-                    await self.put(dc)
+                    dcs.append(dc)
                 else:
 
                     # create artifact for content that has file
@@ -468,11 +689,10 @@ class ContentMigrationFirstStage(Stage):
                         pulp_2to3_detail_content.expected_digests,
                         pulp_2to3_detail_content.expected_size,
                         downloaded=pulp2content.downloaded,
+                        pulp2content=pulp2content,
                     )
                     if artifact is None:
-                        if pb:
-                            await pb.aincrement()
-                        continue
+                        return dcs
 
                     relative_path = pulp_2to3_detail_content.relative_path_for_content_artifact
                     remote_lce_tuples = []
@@ -480,9 +700,7 @@ class ContentMigrationFirstStage(Stage):
 
                     if is_lazy_type and pulp2lazycatalog:
                         for lce in pulp2lazycatalog:
-                            remote = await sync_to_async(get_remote_by_importer_id)(
-                                lce.pulp2_importer_id
-                            )
+                            remote = remotes_by_importer_id.get(lce.pulp2_importer_id)
                             if remote:
                                 remote_lce_tuples.append((remote, lce))
 
@@ -512,7 +730,7 @@ class ContentMigrationFirstStage(Stage):
                             # valid one is migrated.
                             future_relations.update({"lces": list(pulp2lazycatalog)})
                             dc.extra_data = future_relations
-                            await self.put(dc)
+                            dcs.append(dc)
 
                     else:
                         # No migratable LCE available
@@ -523,7 +741,7 @@ class ContentMigrationFirstStage(Stage):
                                     "pulp2 unit_id: {}".format(pulp2content.pulp2_id)
                                 )
                             )
-                            continue
+                            return
 
                         da = DeclarativeArtifact(
                             artifact=artifact,
@@ -534,23 +752,103 @@ class ContentMigrationFirstStage(Stage):
                         )
                         dc = DeclarativeContent(content=pulp3content, d_artifacts=[da])
                         dc.extra_data = future_relations
-                        await self.put(dc)
+                        dcs.append(dc)
+
+                return dcs
+
+            async def migrate_content_in_order():
+                """
+                Migrate up to CONTENT_COPY_WORKERS content units at once, so their files are
+                placed into the Pulp 3 storage concurrently.
+
+                Yields:
+                    list: results of migrate_content() in the order of pre-migrated content
+
+                """
+                pending = collections.deque()
+                try:
+                    async for pulp_2to3_detail_content, precreated in sync_to_async_iterable(
+                        precreate_pulp3_content(pulp_2to3_detail_qs)
+                    ):
+                        pending.append(
+                            asyncio.ensure_future(
+                                migrate_content(pulp_2to3_detail_content, precreated)
+                            )
+                        )
+                        if len(pending) >= settings.CONTENT_COPY_WORKERS:
+                            yield await pending.popleft()
+                    while pending:
+                        yield await pending.popleft()
+                finally:
+                    for task in pending:
+                        task.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+
+            migrated_content = migrate_content_in_order()
+            try:
+                async for dcs in migrated_content:
+                    if dcs is None:
+                        continue
 
-                if pb:
-                    await pb.aincrement()
+                    for dc in dcs:
+                        await self.put(dc)
 
-                if has_future and dc:
-                    futures.append(dc)
-                resolve_futures = len(futures) >= DEFAULT_BATCH_SIZE
-                if resolve_futures:
-                    for dc in futures:
-                        await dc.resolution()
-                    futures.clear()
+                    if pb:
+                        await pb.aincrement()
+
+                    if has_future and dcs:
+                        futures.append(dcs[-1])
+                    if len(futures) >= futures_batch_size:
+                        batch_time = time.monotonic() - futures_batch_start
+                        wait_time = await self.resolve_futures(futures)
+                        futures_wait_time += wait_time
+                        futures_waits += 1
+                        if wait_time > batch_time / 2:
+                            # the pipeline was drained while this stage was waiting, downstream
+                            # stages have spare capacity, so wait less often
+                            futures_batch_size = min(futures_batch_size * 2, max_batch_size)
+                        elif wait_time < batch_time / 10:
+                            # downstream stages keep up with the batch, smaller batches keep the
+                            # memory usage low
+                            futures_batch_size = max(futures_batch_size // 2, min_batch_size)
+                        futures_batch_start = time.monotonic()
+            finally:
+                await migrated_content.aclose()
 
             # resolve futures if there are any left
-            for dc in futures:
-                await dc.resolution()
-            futures.clear()
+            if futures:
+                futures_wait_time += await self.resolve_futures(futures)
+                futures_waits += 1
+
+        if has_future:
+            _logger.info(
+                _(
+                    "Waited {wait_time:.1f}s for {content_type} content to be saved, "
+                    "{waits} times, the final batch size is {batch_size}."
+                ).format(
+                    wait_time=futures_wait_time,
+                    content_type=content_type,
+                    waits=futures_waits,
+                    batch_size=futures_batch_size,
+                )
+            )
+
+    async def resolve_futures(self, futures):
+        """
+        Wait for the content to be saved and clear the list of futures.
+
+        Args:
+            futures(list): DeclarativeContent to wait for
+
+        Returns:
+            float: Time spent waiting, in seconds
+
+        """
+        start = time.monotonic()
+        for dc in futures:
+            await dc.resolution()
+        futures.clear()
+        return time.monotonic() - start
 
 
 class UpdateLCEs(Stage):
@@ -559,6 +857,8 @@ class UpdateLCEs(Stage):
     RemoteArtifact has been saved.
     """
 
+    batch_size = DEFAULT_BATCH_SIZE
+
     async def run(self):
         """
         Find LCEs in the extra_data and flip the is_migrated flag to True
@@ -576,7 +876,7 @@ class UpdateLCEs(Stage):
                     Pulp2LazyCatalog.objects.bulk_update(
                         objs=pulp2lces_batch,
                         fields=["is_migrated"],
-                        batch_size=DEFAULT_BATCH_SIZE,
+                        batch_size=self.batch_size,
                     )
 
             await sync_to_async(process_batch)()
@@ -592,6 +892,8 @@ class RelatePulp2to3Content(Stage):
     Without this stage *all* the content will be migrated on every migration plan run.
     """
 
+    batch_size = DEFAULT_BATCH_SIZE
+
     async def run(self):
         """
         Saves the relation between Pulp2Content and migrated Pulp 3 content.
@@ -612,8 +914,12 @@ class RelatePulp2to3Content(Stage):
                     pulp2content.__class__.objects.bulk_update(
                         objs=pulp2content_batch,
                         fields=["pulp3_content"],
-                        batch_size=DEFAULT_BATCH_SIZE,
+                        batch_size=self.batch_size,
                     )
+                    # the content is migrated, remove it from the work queue and from the skipped
+                    # content if it's there
+                    Pulp2PendingContent.objects.filter(pulp2content__in=pulp2content_batch).delete()
+                    Pulp2SkippedContent.objects.filter(pulp2content__in=pulp2content_batch).delete()
 
             await sync_to_async(process_batch)()
             for d_content in batch:
@@ -12,6 +12,7 @@ from pulpcore.plugin.stages import (
 
 from pulp_deb.app import models as pulp3_models
 
+from pulp_2to3_migration.app.constants import SKIPPED_CONTENT_INCLUDE
 from pulp_2to3_migration.app.plugin.api import (
     ContentMigrationFirstStage,
     DeclarativeContentMigration,
@@ -73,18 +74,31 @@ class DebMigrator(Pulp2to3PluginMigrator):
         "deb_component_package": pulp_2to3_models.Pulp2DebComponentPackage,
         "deb_component_architecture": pulp_2to3_models.Pulp2DebReleaseArchitecture,
     }
+    content_type_dependencies = {
+        "deb_component": ["deb_release"],
+        "deb_component_package": ["deb", "deb_component"],
+        "deb_component_architecture": ["deb_release"],
+    }
 
     @classmethod
-    def migrate_content_to_pulp3(cls, skip_corrupted=False):
+    def migrate_content_to_pulp3(
+        cls, skip_corrupted=False, shard=None, skipped_content=SKIPPED_CONTENT_INCLUDE
+    ):
         """
         Migrate pre-migrated Pulp 2 Debian content.
 
         Args:
             skip_corrupted (bool): If True, corrupted content is skipped during migration,
                                    no task failure.
+            shard (dict): Content types and a range of Pulp2Content pks to migrate, see
+                          ``ContentMigrationFirstStage``. If not set, all content is migrated.
+            skipped_content (str): Whether to migrate content skipped during previous migration
+                                   runs, ``include``, ``only`` or ``exclude`` it.
 
         """
-        first_stage = ContentMigrationFirstStage(cls, skip_corrupted=skip_corrupted)
+        first_stage = ContentMigrationFirstStage(
+            cls, skip_corrupted=skip_corrupted, shard=shard, skipped_content=skipped_content
+        )
         dm = DebDeclarativeContentMigration(first_stage=first_stage)
 
         loop = asyncio.get_event_loop()
@@ -26,7 +26,7 @@ from pulp_container.app.models import (
     Tag,
 )
 
-from pulp_2to3_migration.app.constants import DEFAULT_BATCH_SIZE
+from pulp_2to3_migration.app.constants import DEFAULT_BATCH_SIZE, SKIPPED_CONTENT_INCLUDE
 from pulp_2to3_migration.app.plugin.api import (
     ContentMigrationFirstStage,
     DeclarativeContentMigration,
@@ -92,16 +92,24 @@ class DockerMigrator(Pulp2to3PluginMigrator):
     }
 
     @classmethod
-    def migrate_content_to_pulp3(cls, skip_corrupted=False):
+    def migrate_content_to_pulp3(
+        cls, skip_corrupted=False, shard=None, skipped_content=SKIPPED_CONTENT_INCLUDE
+    ):
         """
         Migrate pre-migrated Pulp 2 docker content.
 
         Args:
             skip_corrupted (bool): If True, corrupted content is skipped during migration,
                                    no task failure.
+            shard (dict): Content types and a range of Pulp2Content pks to migrate, see
+                          ``ContentMigrationFirstStage``. If not set, all content is migrated.
+            skipped_content (str): Whether to migrate content skipped during previous migration
+                                   runs, ``include``, ``only`` or ``exclude`` it.
 
         """
-        first_stage = ContentMigrationFirstStage(cls, skip_corrupted=skip_corrupted)
+        first_stage = ContentMigrationFirstStage(
+            cls, skip_corrupted=skip_corrupted, shard=shard, skipped_content=skipped_content
+        )
         dm = DockerDeclarativeContentMigration(first_stage=first_stage)
 
         loop = asyncio.get_event_loop()
@@ -142,6 +150,8 @@ class InterrelateContent(Stage):
     Stage for relating Content to other Content.
     """
 
+    batch_size = DEFAULT_BATCH_SIZE
+
     async def run(self):
         """
         Relate each item in the input queue to objects specified on the DeclarativeContent.
@@ -153,83 +163,111 @@ class InterrelateContent(Stage):
                 blob_manifest_batch = []
                 manifest_batch = []
                 with transaction.atomic():
+                    blobs, manifests = self.get_related_content(batch)
                     for dc in batch:
                         if dc.extra_data.get("man_rel"):
-                            thru = self.relate_manifest_to_list(dc)
+                            thru = self.relate_manifest_to_list(dc, manifests)
                             manifestlist_manifest_batch.extend(thru)
                         elif dc.extra_data.get("blob_rel"):
-                            thru = self.relate_blob(dc)
+                            thru = self.relate_blob(dc, blobs)
                             blob_manifest_batch.extend(thru)
 
                         if dc.extra_data.get("config_blob_rel"):
-                            manifest_to_update = self.relate_config_blob(dc)
+                            manifest_to_update = self.relate_config_blob(dc, blobs)
                             manifest_batch.append(manifest_to_update)
 
                     ManifestListManifest.objects.bulk_create(
                         objs=manifestlist_manifest_batch,
                         ignore_conflicts=True,
-                        batch_size=DEFAULT_BATCH_SIZE,
+                        batch_size=self.batch_size,
                     )
                     BlobManifest.objects.bulk_create(
                         objs=blob_manifest_batch,
                         ignore_conflicts=True,
-                        batch_size=DEFAULT_BATCH_SIZE,
+                        batch_size=self.batch_size,
                     )
 
                     Manifest.objects.bulk_update(
                         objs=manifest_batch,
                         fields=["config_blob"],
-                        batch_size=DEFAULT_BATCH_SIZE,
+                        batch_size=self.batch_size,
                     )
 
             await sync_to_async(process_batch)()
             for dc in batch:
                 await self.put(dc)
 
-    def relate_config_blob(self, dc):
+    @staticmethod
+    def get_related_content(batch):
+        """
+        Find all Blobs and Manifests which content of the batch should be related to.
+
+        We are relying on the order of the processed DC.
+        Blobs and Manifests should have passed through ContentSaver stage already.
+
+        Args:
+            batch(list): a batch of DeclarativeContent
+
+        Returns:
+            tuple: dicts of Blobs and of Manifests, with digests as keys
+        """
+        blob_digests = set()
+        manifest_digests = set()
+        for dc in batch:
+            if dc.extra_data.get("man_rel"):
+                manifest_digests.update(dc.extra_data["man_rel"])
+            elif dc.extra_data.get("blob_rel"):
+                blob_digests.update(dc.extra_data["blob_rel"])
+
+            if dc.extra_data.get("config_blob_rel"):
+                blob_digests.add(dc.extra_data["config_blob_rel"])
+
+        blobs = {}
+        if blob_digests:
+            blobs = {blob.digest: blob for blob in Blob.objects.filter(digest__in=blob_digests)}
+        manifests = {}
+        if manifest_digests:
+            manifests = {
+                manifest.digest: manifest
+                for manifest in Manifest.objects.filter(digest__in=manifest_digests)
+            }
+        return blobs, manifests
+
+    def relate_config_blob(self, dc, blobs):
         """
         Relate a Blob to a Manifest as a config layer.
 
         Args:
             dc (pulpcore.plugin.stages.DeclarativeContent): dc for a Manifest
+            blobs (dict): Blobs referenced by the batch, with digests as keys
         """
-        configured_dc_id = dc.extra_data.get("config_blob_rel")
-        # find blob by id
-        # We are relying on the order of the processed DC
-        # Blobs should have passed through ContentSaver stage already
-        blob = Blob.objects.filter(digest=configured_dc_id).first()
-        dc.content.config_blob = blob
+        dc.content.config_blob = blobs.get(dc.extra_data.get("config_blob_rel"))
         return dc.content
 
-    def relate_blob(self, dc):
+    def relate_blob(self, dc, blobs):
         """
         Relate a Blob to a Manifest.
 
         Args:
             dc (pulpcore.plugin.stages.DeclarativeContent): dc for a Manifest
+            blobs (dict): Blobs referenced by the batch, with digests as keys
         """
-        related_dc_id_list = dc.extra_data.get("blob_rel")
-        # find blob by id
-        # We are relying on the order of the processed DC
-        # Blobs should have passed through ContentSaver stage already
-        blob_list = Blob.objects.filter(digest__in=related_dc_id_list)
         thru = []
-        for blob in blob_list:
-            thru.append(BlobManifest(manifest=dc.content, manifest_blob=blob))
+        for digest in set(dc.extra_data.get("blob_rel")):
+            blob = blobs.get(digest)
+            if blob:
+                thru.append(BlobManifest(manifest=dc.content, manifest_blob=blob))
         return thru
 
-    def relate_manifest_to_list(self, dc):
+    def relate_manifest_to_list(self, dc, manifests):
         """
         Relate an ImageManifest to a ManifestList.
 
         Args:
             dc (pulpcore.plugin.stages.DeclarativeContent): dc for a Manifest list
+            manifests (dict): Manifests referenced by the batch, with digests as keys
         """
-        related_dc_id_list = dc.extra_data.get("man_rel")
-        # find manifests by id
-        # We are relying on the order of the processed DC
-        # Manifests should have passed through ContentSaver stage already
-        man_list = Manifest.objects.filter(digest__in=related_dc_id_list)
+        related_digests = set(dc.extra_data.get("man_rel"))
         # read json file to revieve platfrom data
         with dc.content._artifacts.get().file.open() as content_file:
             raw = content_file.read()
@@ -239,21 +277,20 @@ class InterrelateContent(Stage):
         mlm = []
         for manifest in manifests_from_json:
             digest = manifest["digest"]
-            for item in man_list:
-                if item.digest == digest:
-                    platform = manifest["platform"]
-                    thru = ManifestListManifest(
-                        manifest_list=item,
-                        image_manifest=dc.content,
-                        architecture=platform["architecture"],
-                        os=platform["os"],
-                        features=platform.get("features", ""),
-                        variant=platform.get("variant", ""),
-                        os_version=platform.get("os.version", ""),
-                        os_features=platform.get("os.features", ""),
-                    )
-                    mlm.append(thru)
-                    break
+            item = manifests.get(digest) if digest in related_digests else None
+            if item:
+                platform = manifest["platform"]
+                thru = ManifestListManifest(
+                    manifest_list=item,
+                    image_manifest=dc.content,
+                    architecture=platform["architecture"],
+                    os=platform["os"],
+                    features=platform.get("features", ""),
+                    variant=platform.get("variant", ""),
+                    os_version=platform.get("os.version", ""),
+                    os_features=platform.get("os.features", ""),
+                )
+                mlm.append(thru)
         return mlm
 
 
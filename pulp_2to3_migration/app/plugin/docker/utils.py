@@ -3,17 +3,41 @@ from pulp_2to3_migration.app.constants import DEFAULT_BATCH_SIZE
 from . import pulp2_models
 
 
-def find_tags():
+def find_tags(last_updated=0):
     """
     Find tags that have same name within the repo.
     Return only one tag out of 2 tags with the same name.
     Prefer schema2 over schema1.
+
+    Only repos with tags updated since the last pre-migration are considered, the other tags
+    haven't changed and are filtered out by the pre-migration anyway.
+
+    Args:
+        last_updated(int): timestamp of the latest pre-migrated tag
+
+    Returns:
+        list: ids of the tags to premigrate
+
     """
 
     batch_size = settings.CONTENT_PREMIGRATION_BATCH_SIZE or DEFAULT_BATCH_SIZE
+    tag_collection = pulp2_models.Tag._get_collection()
+
+    pipeline = []
+    if last_updated:
+        # tags of the same repo have to be compared with all the other tags of that repo, so
+        # all the tags of the repos with updated tags are considered
+        updated_repo_ids = tag_collection.distinct(
+            "repo_id", {"_last_updated": {"$gte": last_updated}}
+        )
+        if not updated_repo_ids:
+            return []
+        pipeline.append({"$match": {"repo_id": {"$in": updated_repo_ids}}})
 
     # sort the schema version in desc mode.
-    sort_stage = {"$sort": {"schema_version": -1}}
+    # The order of the fields matches the unit key index (name, repo_id, schema_version,
+    # manifest_type) scanned backwards, so tags are not sorted in memory.
+    sort_stage = {"$sort": {"name": -1, "repo_id": -1, "schema_version": -1}}
     # group tags by name and repo_id; take just first result out of the 2 tags with the same name
     group_stage = {
         "$group": {
@@ -23,12 +47,7 @@ def find_tags():
     }
     # get only the require field to minimize the result BSON size
     project_stage = {"$project": {"_id": 0, "tags_id": 1}}
-    result = pulp2_models.Tag.objects.aggregate(
-        [sort_stage, group_stage, project_stage], allowDiskUse=True
-    ).batch_size(batch_size)
-
-    tags_ids = set([])
-    for tag in result:
-        tags_ids.add(tag["tags_id"])
+    pipeline.extend([sort_stage, group_stage, project_stage])
+    result = tag_collection.aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
 
-    return list(tags_ids)
+    return [tag["tags_id"] for tag in result]
@@ -0,0 +1,246 @@
+import contextvars
+import json
+import logging
+import time
+
+from gettext import gettext as _
+
+from asgiref.sync import sync_to_async
+from django.db import connection
+
+from pulpcore.plugin.models import ProgressReport
+
+_logger = logging.getLogger(__name__)
+
+# statistics of the stage which is currently running in the context, used to count DB queries
+_current_stage_stats = contextvars.ContextVar("pulp_2to3_current_stage_stats", default=None)
+
+
+class StageStats:
+    """
+    Statistics collected for a stage of a content migration pipeline.
+
+    Attributes:
+        name(str): Name of the stage
+        items_in(int): Number of items received from the input queue
+        items_out(int): Number of items put into the output queue
+        batches(int): Number of batches processed
+        queries(int): Number of DB queries executed
+        total_time(float): Time since the stage was started until it finished, in seconds
+        in_wait_time(float): Time spent waiting for items from the input queue, in seconds
+        out_wait_time(float): Time spent waiting for space in the output queue, in seconds
+
+    """
+
+    def __init__(self, name):
+        """Initializes StageStats."""
+        self.name = name
+        self.items_in = 0
+        self.items_out = 0
+        self.batches = 0
+        self.queries = 0
+        self.total_time = 0
+        self.in_wait_time = 0
+        self.out_wait_time = 0
+
+    @property
+    def busy_time(self):
+        """Time spent on processing, when not waiting for the queues, in seconds."""
+        return max(self.total_time - self.in_wait_time - self.out_wait_time, 0)
+
+    def as_dict(self):
+        """
+        Returns:
+            dict: The collected statistics, time is rounded to milliseconds
+
+        """
+        return {
+            "stage": self.name,
+            "items_in": self.items_in,
+            "items_out": self.items_out,
+            "batches": self.batches,
+            "queries": self.queries,
+            "busy_time": round(self.busy_time, 3),
+            "in_wait_time": round(self.in_wait_time, 3),
+            "out_wait_time": round(self.out_wait_time, 3),
+        }
+
+
+class _TimedQueue:
+    """
+    A proxy for a queue between stages which counts items and measures how long a stage waits
+    to put them.
+
+    The time spent waiting for the input is measured around ``Stage.items()`` and
+    ``Stage.batches()`` instead, because ``batches()`` requests the next item from the queue
+    before the current batch is processed.
+    """
+
+    def __init__(self, queue, stats):
+        self._queue = queue
+        self._stats = stats
+
+    async def get(self):
+        item = await self._queue.get()
+        if item is not None:
+            self._stats.items_in += 1
+        return item
+
+    def get_nowait(self):
+        item = self._queue.get_nowait()
+        if item is not None:
+            self._stats.items_in += 1
+        return item
+
+    async def put(self, item):
+        start = time.monotonic()
+        await self._queue.put(item)
+        self._stats.out_wait_time += time.monotonic() - start
+        if item is not None:
+            self._stats.items_out += 1
+
+    def __getattr__(self, name):
+        return getattr(self._queue, name)
+
+
+def _count_query(execute, sql, params, many, context):
+    """
+    A DB execute wrapper which counts queries for the stage they are executed for.
+    """
+    stats = _current_stage_stats.get()
+    if stats is not None:
+        stats.queries += 1
+    return execute(sql, params, many, context)
+
+
+def instrument_stage(stage):
+    """
+    Wrap a stage to collect statistics about its work.
+
+    It has to be called before the stage is connected to the pipeline.
+
+    Args:
+        stage(pulpcore.plugin.stages.Stage): A stage to instrument
+
+    Returns:
+        StageStats: Statistics which will be collected while the stage runs
+
+    """
+    stats = StageStats(stage.__class__.__name__)
+    original_connect = stage._connect
+    original_run = stage.run
+    original_items = stage.items
+    original_batches = stage.batches
+
+    def connect(in_q, out_q):
+        original_connect(
+            _TimedQueue(in_q, stats) if in_q is not None else None,
+            _TimedQueue(out_q, stats) if out_q is not None else None,
+        )
+
+    async def run():
+        token = _current_stage_stats.set(stats)
+        start = time.monotonic()
+        try:
+            await original_run()
+        finally:
+            stats.total_time += time.monotonic() - start
+            _current_stage_stats.reset(token)
+
+    async def items(*args, **kwargs):
+        # from the time the stage asks for the next item until it gets it
+        start = time.monotonic()
+        async for item in original_items(*args, **kwargs):
+            stats.in_wait_time += time.monotonic() - start
+            yield item
+            start = time.monotonic()
+        stats.in_wait_time += time.monotonic() - start
+
+    async def batches(*args, **kwargs):
+        # from the time the stage asks for the next batch until it gets it
+        start = time.monotonic()
+        async for batch in original_batches(*args, **kwargs):
+            stats.in_wait_time += time.monotonic() - start
+            stats.batches += 1
+            yield batch
+            start = time.monotonic()
+        stats.in_wait_time += time.monotonic() - start
+
+    stage._connect = connect
+    stage.run = run
+    stage.items = items
+    stage.batches = batches
+    return stats
+
+
+class PipelineInstrumentation:
+    """
+    Collects statistics for all stages of a content migration pipeline.
+
+    It's used as an asynchronous context manager around the pipeline run, so DB queries are
+    counted only while the pipeline is running.
+
+    Example:
+        >>> instrumentation = PipelineInstrumentation(stages)
+        >>> async with instrumentation:
+        >>>     await create_pipeline(stages)
+        >>> await sync_to_async(instrumentation.report)("rpm")
+    """
+
+    def __init__(self, stages):
+        """
+        Args:
+            stages(list): Stages to instrument, they should not be connected yet
+        """
+        self.stats = [instrument_stage(stage) for stage in stages]
+
+    @staticmethod
+    def _install():
+        connection.execute_wrappers.append(_count_query)
+
+    @staticmethod
+    def _uninstall():
+        if _count_query in connection.execute_wrappers:
+            connection.execute_wrappers.remove(_count_query)
+
+    async def __aenter__(self):
+        # queries can be run either in the event loop thread or in the thread used by
+        # sync_to_async, each of them has its own DB connection
+        self._install()
+        await sync_to_async(self._install)()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        self._uninstall()
+        await sync_to_async(self._uninstall)()
+
+    def report(self, plugin):
+        """
+        Save the collected statistics as progress reports and log them.
+
+        Args:
+            plugin(str): Pulp 2 plugin name the content was migrated for
+
+        """
+        for stats in self.stats:
+            ProgressReport(
+                message=_(
+                    "Content migration stage {name}: busy {busy:.1f}s, waiting for input "
+                    "{in_wait:.1f}s, waiting for output {out_wait:.1f}s, {batches} batches, "
+                    "{queries} DB queries"
+                ).format(
+                    name=stats.name,
+                    busy=stats.busy_time,
+                    in_wait=stats.in_wait_time,
+                    out_wait=stats.out_wait_time,
+                    batches=stats.batches,
+                    queries=stats.queries,
+                ),
+                code="migrating.{}.stage".format(plugin),
+                total=stats.items_in,
+                done=stats.items_out,
+                state="completed",
+            ).save()
+
+        summary = {"plugin": plugin, "stages": [stats.as_dict() for stats in self.stats]}
+        _logger.info(_("Content migration pipeline statistics: {}").format(json.dumps(summary)))
@@ -1,5 +1,6 @@
 import asyncio
 
+from pulp_2to3_migration.app.constants import SKIPPED_CONTENT_INCLUDE
 from pulp_2to3_migration.app.plugin.api import (
     ContentMigrationFirstStage,
     DeclarativeContentMigration,
@@ -49,16 +50,24 @@ class IsoMigrator(Pulp2to3PluginMigrator):
     }
 
     @classmethod
-    def migrate_content_to_pulp3(cls, skip_corrupted=False):
+    def migrate_content_to_pulp3(
+        cls, skip_corrupted=False, shard=None, skipped_content=SKIPPED_CONTENT_INCLUDE
+    ):
         """
         Migrate pre-migrated Pulp 2 ISO content.
 
         Args:
             skip_corrupted (bool): If True, corrupted content is skipped during migration,
                                    no task failure.
+            shard (dict): Content types and a range of Pulp2Content pks to migrate, see
+                          ``ContentMigrationFirstStage``. If not set, all content is migrated.
+            skipped_content (str): Whether to migrate content skipped during previous migration
+                                   runs, ``include``, ``only`` or ``exclude`` it.
 
         """
-        first_stage = ContentMigrationFirstStage(cls, skip_corrupted=skip_corrupted)
+        first_stage = ContentMigrationFirstStage(
+            cls, skip_corrupted=skip_corrupted, shard=shard, skipped_content=skipped_content
+        )
         dm = DeclarativeContentMigration(first_stage=first_stage)
 
         loop = asyncio.get_event_loop()
@@ -1,3 +1,6 @@
+from pulp_2to3_migration.app.constants import DEFAULT_BATCH_SIZE, SKIPPED_CONTENT_INCLUDE
+
+
 class Pulp2to3PluginMigrator:
     """
     Class to serve as a plugin interface for migration to Pulp 3.
@@ -17,6 +20,10 @@ class Pulp2to3PluginMigrator:
         importer_migrators(dict): {'importer_type_id': 'pulp_2to3 importer interface/migrator'}
         distributor_migrators(dict): {'distributor_type_id': 'pulp_2to3 dist interface/migrator'}
         premigrate_hook(dict): {'content_type_id': 'a callback to determine units to premigrate'}.
+                               If the callback has a ``last_updated`` parameter, it gets the
+                               timestamp of the latest pre-migrated unit, only units updated
+                               since then are pre-migrated. It returns either a list of ids of
+                               the units or a mongoengine Q object to filter the units by.
                                Optional.
         artifactless_types(dict): {'content_type_id': 'detail content class to pre-migrate to'}.
                                   Optional.
@@ -26,6 +33,20 @@ class Pulp2to3PluginMigrator:
                             Optional.
         multi_artifact_types(dict): {'content_type_id': 'detail content class to pre-migrate to'}.
                                     Optional.
+        content_type_dependencies(dict): {'content_type_id': ['content_type_id', ...]}, content
+                                         types which need to be migrated before a content type
+                                         can be migrated. Content types which don't depend on
+                                         each other are migrated concurrently. Optional, by
+                                         default content types are migrated one by one in the
+                                         order of ``content_models``.
+        futures_batch_min_size(int): The min number of content units of ``future_types`` to
+                                     put into the pipeline before waiting for them to be saved.
+        futures_batch_max_size(int): The max number of content units of ``future_types`` to
+                                     put into the pipeline before waiting for them to be saved.
+                                     The actual number starts at the min and is adjusted
+                                     depending on how long the stage waits for the content to
+                                     be saved compared to the time it took to put it into the
+                                     pipeline.
 
     """
 
@@ -35,9 +56,32 @@ class Pulp2to3PluginMigrator:
     lazy_types = {}
     future_types = {}
     multi_artifact_types = {}
+    content_type_dependencies = None
+    futures_batch_min_size = DEFAULT_BATCH_SIZE
+    futures_batch_max_size = DEFAULT_BATCH_SIZE * 5
+
+    @classmethod
+    def get_content_type_dependencies(cls):
+        """
+        Return dependencies between content types for the content migration.
+
+        Returns:
+            dict: {'content_type_id': ['content_type_id', ...]}, prerequisites for content types
+
+        """
+        if cls.content_type_dependencies is not None:
+            return cls.content_type_dependencies
+
+        content_types = list(cls.content_models)
+        return {
+            content_type: [previous_type]
+            for previous_type, content_type in zip(content_types, content_types[1:])
+        }
 
     @classmethod
-    def migrate_content_to_pulp3(cls, skip_corrupted=False):
+    def migrate_content_to_pulp3(
+        cls, skip_corrupted=False, shard=None, skipped_content=SKIPPED_CONTENT_INCLUDE
+    ):
         """
         Migrate all pre-migrated plugin content to Pulp 3.
 
@@ -50,6 +94,19 @@ class Pulp2to3PluginMigrator:
         Args:
             skip_corrupted (bool): If True, corrupted content is skipped during migration,
                                    no task failure.
+            shard (dict): Content types and a range of Pulp2Content pks to migrate, see
+                          ``ContentMigrationFirstStage``. If not set, all content is migrated.
+            skipped_content (str): Whether to migrate content skipped during previous migration
+                                   runs, ``include``, ``only`` or ``exclude`` it.
 
         """
         raise NotImplementedError()
+
+    @classmethod
+    def finalize_pre_migration(cls):
+        """
+        Pre-migrate plugin data which depends on both pre-migrated repositories and content.
+
+        It's called after all the content of a plugin is pre-migrated. Optional.
+        """
+        pass
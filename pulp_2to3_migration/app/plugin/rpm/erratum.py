@@ -20,9 +20,9 @@ def get_pulp2_filtered_collections(pulp2erratum, repo_pkg_nevra, repo_module_nsv
 
     Args:
         pulp2erratum: a pre-migrated erratum to be migrated
-        repo_pkg_nevra: list of NEVRA tuples for the packages in a repository this erratum is
+        repo_pkg_nevra: NEVRA tuples for the packages in a repository this erratum is
                         being migrated for
-        repo_module_nsvca: list of NSVCA tuples for the modules in a repository this erratum is
+        repo_module_nsvca: NSVCA tuples for the modules in a repository this erratum is
                            being migrated for
 
     Return:
@@ -56,8 +56,9 @@ def get_pulp2_filtered_collections(pulp2erratum, repo_pkg_nevra, repo_module_nsv
         # Return a pkglist with one empty collection (an empty pkglist is not allowed).
         return filtered_pkglist
 
-    repo_pkg_nevra = set(repo_pkg_nevra)
-    repo_module_nsvca = set(repo_module_nsvca)
+    # no copy is made if frozensets are passed
+    repo_pkg_nevra = frozenset(repo_pkg_nevra)
+    repo_module_nsvca = frozenset(repo_module_nsvca)
     seen_non_modular_packages = set()
     seen_modules = set()
     for collection in pulp2erratum.pkglist:
@@ -2,12 +2,12 @@ import asyncio
 
 from asgiref.sync import sync_to_async
 
-from django.db import transaction
-from django.db.models import Q
+from django.db import connection, transaction
 
 from collections import OrderedDict
 
-from pulp_2to3_migration.app.constants import DEFAULT_BATCH_SIZE
+from pulp_2to3_migration.app.constants import DEFAULT_BATCH_SIZE, SKIPPED_CONTENT_INCLUDE
+from pulp_2to3_migration.app.models import Pulp2Content, Pulp2RepoContent, Pulp2Repository
 from pulp_2to3_migration.app.plugin.api import (
     ContentMigrationFirstStage,
     DeclarativeContentMigration,
@@ -46,6 +46,8 @@ from .pulp_2to3_models import (
     Pulp2Rpm,
     Pulp2Srpm,
     Pulp2YumRepoMetadataFile,
+    clear_advisory_cache,
+    clear_treeinfo_cache,
 )
 
 from .repository import (
@@ -53,6 +55,7 @@ from .repository import (
     RpmImporter,
 )
 
+from .package_creation import shutdown_package_pool
 from .utils import exclude_unsupported_metadata
 
 from . import package_utils
@@ -132,25 +135,81 @@ class RpmMigrator(Pulp2to3PluginMigrator):
         "package_environment": Pulp2PackageEnvironment,
     }
     multi_artifact_types = {"distribution": Pulp2Distribution}
+    # modules are related to the already migrated modular packages
+    content_type_dependencies = {"modulemd": ["rpm", "srpm"]}
     premigrate_hook = {
         "yum_repo_metadata_file": exclude_unsupported_metadata,
     }
 
     @classmethod
-    def migrate_content_to_pulp3(cls, skip_corrupted=False):
+    def migrate_content_to_pulp3(
+        cls, skip_corrupted=False, shard=None, skipped_content=SKIPPED_CONTENT_INCLUDE
+    ):
         """
         Migrate pre-migrated Pulp 2 RPM plugin content.
 
         Args:
             skip_corrupted (bool): If True, corrupted content is skipped during migration,
                                    no task failure.
+            shard (dict): Content types and a range of Pulp2Content pks to migrate, see
+                          ``ContentMigrationFirstStage``. If not set, all content is migrated.
+            skipped_content (str): Whether to migrate content skipped during previous migration
+                                   runs, ``include``, ``only`` or ``exclude`` it.
 
         """
-        first_stage = ContentMigrationFirstStage(cls, skip_corrupted=skip_corrupted)
+        first_stage = ContentMigrationFirstStage(
+            cls, skip_corrupted=skip_corrupted, shard=shard, skipped_content=skipped_content
+        )
         dm = RpmDeclarativeContentMigration(first_stage=first_stage)
 
         loop = asyncio.get_event_loop()
-        loop.run_until_complete(dm.create())
+        try:
+            loop.run_until_complete(dm.create())
+        finally:
+            clear_advisory_cache()
+            clear_treeinfo_cache()
+            shutdown_package_pool()
+
+    @classmethod
+    def finalize_pre_migration(cls):
+        """
+        Find the most common checksum type of packages in each pre-migrated repository.
+
+        It's needed to publish the repository with the same checksum type as in Pulp 2, when it's
+        not configured explicitly.
+        """
+        repo_table = Pulp2Repository._meta.db_table
+        repocontent_table = Pulp2RepoContent._meta.db_table
+        pulp2content_table = Pulp2Content._meta.db_table
+        rpm_table = Pulp2Rpm._meta.db_table
+        srpm_table = Pulp2Srpm._meta.db_table
+
+        # repos without packages get NULL, so a value from the time they had packages is not kept
+        update_checksum_type_query = f"""
+            UPDATE {repo_table}
+               SET package_checksum_type = dominant.checksumtype
+              FROM {repo_table} AS repo
+              LEFT JOIN (
+                SELECT DISTINCT ON (rc.pulp2_repository_id)
+                       rc.pulp2_repository_id, pkg.checksumtype
+                  FROM {repocontent_table} AS rc
+                  INNER JOIN {pulp2content_table} AS c ON
+                    (c.pulp2_id = rc.pulp2_unit_id
+                     AND c.pulp2_content_type_id = rc.pulp2_content_type_id)
+                  INNER JOIN (
+                    SELECT pulp2content_id, checksumtype FROM {rpm_table}
+                    UNION ALL
+                    SELECT pulp2content_id, checksumtype FROM {srpm_table}
+                  ) AS pkg ON pkg.pulp2content_id = c.pulp_id
+                 WHERE rc.pulp2_content_type_id IN ('rpm', 'srpm')
+                 GROUP BY rc.pulp2_repository_id, pkg.checksumtype
+                 ORDER BY rc.pulp2_repository_id, count(*) DESC
+              ) AS dominant ON dominant.pulp2_repository_id = repo.pulp_id
+             WHERE {repo_table}.pulp_id = repo.pulp_id
+               AND {repo_table}.package_checksum_type IS DISTINCT FROM dominant.checksumtype
+        """
+        with connection.cursor() as cursor:
+            cursor.execute(update_checksum_type_query)
 
 
 class RpmDeclarativeContentMigration(DeclarativeContentMigration):
@@ -189,6 +248,8 @@ class InterrelateContent(Stage):
     Stage for relating Content to other Content.
     """
 
+    batch_size = DEFAULT_BATCH_SIZE
+
     async def run(self):
         """
         Relate each item in the input queue to objects specified on the DeclarativeContent.
@@ -196,63 +257,86 @@ class InterrelateContent(Stage):
         async for batch in self.batches():
 
             def process_batch():
-                modulemd_packages_batch = []
                 with transaction.atomic():
-                    for dc in batch:
-                        if type(dc.content) == Modulemd:
-                            thru = self.relate_packages_to_module(dc)
-                            modulemd_packages_batch.extend(thru)
+                    module_dcs = [dc for dc in batch if type(dc.content) == Modulemd]
+                    modulemd_packages_batch = self.relate_packages_to_modules(module_dcs)
 
                     ModulemdPackages = Modulemd.packages.through
                     ModulemdPackages.objects.bulk_create(
                         objs=modulemd_packages_batch,
                         ignore_conflicts=True,
-                        batch_size=DEFAULT_BATCH_SIZE,
+                        batch_size=self.batch_size,
                     )
 
             await sync_to_async(process_batch)()
             for dc in batch:
                 await self.put(dc)
 
-    def relate_packages_to_module(self, module_dc):
+    def relate_packages_to_modules(self, module_dcs):
         """
-        Relate Packages to a Module.
+        Relate Packages to Modules.
 
         Args:
-            module_dc (pulpcore.plugin.stages.DeclarativeContent): dc for a Module
+            module_dcs (list): dcs for Modules
+
+        Returns:
+            list: unsaved relations between the Modules and their Packages
+
         """
         ModulemdPackages = Modulemd.packages.through
-        artifacts_list = module_dc.content.artifacts
-        # find rpm by nevra
+        module_nevras = []
+        for module_dc in module_dcs:
+            nevras = {package_utils.nevra(artifact) for artifact in module_dc.content.artifacts}
+            module_nevras.append((module_dc.content.pk, nevras))
+
+        # find rpms by nevra
         # We are relying on the order of the processed DC
         # RPMs should have passed through ContentSaver stage already
-        pq = Q()
-        for artifact in artifacts_list:
-            nevra = package_utils.nevra(artifact)
-            pq |= Q(
-                name=nevra[0],
-                epoch=nevra[1],
-                version=nevra[2],
-                release=nevra[3],
-                arch=nevra[4],
-                is_modular=True,
-            )
-        packages_list = []
-        if pq:
-            packages_list = (
-                Package.objects.filter(pq)
-                .only("pk", "name", "epoch", "version", "release", "arch")
-                .iterator()
-            )
+        all_nevras = set().union(*(nevras for _module_pk, nevras in module_nevras))
+        package_pks = self.get_modular_package_pks(all_nevras)
 
         thru = []
-        # keep track of rpm nevra for which we already created a relation with module.
-        # it can happen that we have 2 rpms with same nevra but different checksum
-        # in that case just skip the second occurrence of rpm and do not create the relation
-        already_related = []
-        for pkg in packages_list:
-            nevra = pkg.nevra
-            if nevra not in already_related:
-                thru.append(ModulemdPackages(package_id=pkg.pk, modulemd_id=module_dc.content.pk))
-                already_related.append(nevra)
+        for module_pk, nevras in module_nevras:
+            for nevra in sorted(nevras):
+                if nevra in package_pks:
+                    thru.append(
+                        ModulemdPackages(package_id=package_pks[nevra], modulemd_id=module_pk)
+                    )
         return thru
+
+    def get_modular_package_pks(self, nevras):
+        """
+        Find modular Packages by NEVRA.
+
+        It can happen that there are 2 rpms with the same NEVRA but different checksum, in that
+        case only one of them is returned, and only that one is related to a module.
+
+        Args:
+            nevras (set): NEVRA tuples of the packages to find
+
+        Returns:
+            dict: PKs of the packages keyed on their NEVRA
+
+        """
+        package_table = Package._meta.db_table
+        package_pk = Package._meta.pk.column
+        nevras = sorted(nevras)
+        package_pks = {}
+        for i in range(0, len(nevras), self.batch_size):
+            nevras_chunk = nevras[i : i + self.batch_size]
+            values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(nevras_chunk))
+            query = f"""
+                SELECT pkg.{package_pk}, pkg.name, pkg.epoch, pkg.version, pkg.release, pkg.arch
+                  FROM {package_table} AS pkg
+                  INNER JOIN (VALUES {values}) AS nevra (name, epoch, version, release, arch) ON
+                    (pkg.name = nevra.name AND pkg.epoch = nevra.epoch
+                     AND pkg.version = nevra.version AND pkg.release = nevra.release
+                     AND pkg.arch = nevra.arch)
+                 WHERE pkg.is_modular = true
+            """
+            params = [field for nevra in nevras_chunk for field in nevra]
+            with connection.cursor() as cursor:
+                cursor.execute(query, params)
+                for pk, *nevra in cursor.fetchall():
+                    package_pks.setdefault(tuple(nevra), pk)
+        return package_pks
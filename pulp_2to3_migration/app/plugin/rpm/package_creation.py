@@ -0,0 +1,129 @@
+"""
+To create Pulp 3 Packages from the metadata templates stored in Pulp 2 in worker processes.
+
+"""
+
+import math
+import multiprocessing
+
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.conf import settings
+
+from pulp_rpm.app.models import Package
+
+from .xml_utils import (
+    decompress_repodata,
+    parse_repodata_batch,
+    render_filelists,
+    render_other,
+    render_primary,
+)
+
+_package_pool = None
+
+
+def get_package_pool():
+    """
+    Return a pool of processes to create Packages in, it's started on the first use.
+
+    The number of processes is limited by the ``RPM_CONTENT_CREATION_PROCESSES`` setting.
+    The processes are spawned and not forked, because a migration task runs other threads and has
+    DB and MongoDB connections open which must not be shared with the child processes. Django is
+    set up in each process, because the Package model is needed to convert the parsed packages.
+
+    Returns:
+        concurrent.futures.ProcessPoolExecutor: the pool to parse package metadata in
+
+    """
+    global _package_pool
+    if _package_pool is None:
+        _package_pool = ProcessPoolExecutor(
+            max_workers=settings.RPM_CONTENT_CREATION_PROCESSES,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=django.setup,
+        )
+    return _package_pool
+
+
+def shutdown_package_pool():
+    """
+    Stop the pool processes, if they have been started.
+
+    It should be called when content migration is finished.
+    """
+    global _package_pool
+    if _package_pool is not None:
+        _package_pool.shutdown()
+        _package_pool = None
+
+
+def get_package_templates(pulp2rpm):
+    """
+    Get everything that is needed to create a Package, in a form which can be sent to a process.
+
+    Args:
+        pulp2rpm(Pulp2RpmBase): a pre-migrated package
+
+    Returns:
+        tuple: compressed primary, filelists and other templates, checksum and checksum type
+
+    """
+    return (
+        bytes(pulp2rpm.primary_template_gz),
+        bytes(pulp2rpm.filelists_template_gz),
+        bytes(pulp2rpm.other_template_gz),
+        pulp2rpm.checksum,
+        pulp2rpm.checksumtype,
+    )
+
+
+def create_package_dicts(package_templates):
+    """
+    Render and parse metadata of packages, it's run in a worker process.
+
+    Args:
+        package_templates(list): results of get_package_templates() for the packages
+
+    Returns:
+        list: data for Package creation in the same order as the package templates
+
+    """
+    primary_xmls = []
+    filelists_xmls = []
+    other_xmls = []
+    for primary_gz, filelists_gz, other_gz, checksum, checksumtype in package_templates:
+        primary_template = decompress_repodata(memoryview(primary_gz))
+        primary_xmls.append(render_primary(primary_template, checksum, checksumtype))
+        filelists_template = decompress_repodata(memoryview(filelists_gz))
+        filelists_xmls.append(render_filelists(filelists_template, checksum))
+        other_template = decompress_repodata(memoryview(other_gz))
+        other_xmls.append(render_other(other_template, checksum))
+
+    cr_packages = parse_repodata_batch(primary_xmls, filelists_xmls, other_xmls)
+    return [Package.createrepo_to_dict(cr_package) for cr_package in cr_packages]
+
+
+def create_package_dicts_in_pool(pulp2rpms):
+    """
+    Create data for Packages by spreading the packages evenly across the pool processes.
+
+    Args:
+        pulp2rpms(list): pre-migrated packages to create data for
+
+    Returns:
+        list: data for Package creation in the same order as the packages
+
+    """
+    processes = settings.RPM_CONTENT_CREATION_PROCESSES
+    chunk_size = max(math.ceil(len(pulp2rpms) / processes), 1)
+    pool = get_package_pool()
+    futures = [
+        pool.submit(
+            create_package_dicts,
+            [get_package_templates(pulp2rpm) for pulp2rpm in pulp2rpms[i : i + chunk_size]],
+        )
+        for i in range(0, len(pulp2rpms), chunk_size)
+    ]
+    return [pkg_dict for future in futures for pkg_dict in future.result()]
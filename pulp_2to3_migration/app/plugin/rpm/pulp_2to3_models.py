@@ -1,15 +1,21 @@
+import hashlib
+import io
+import json
 import os
 
 import bson
-import hashlib
-from collections import defaultdict
+from collections import defaultdict, OrderedDict
 
 import createrepo_c as cr
 
-from django.db import models
+from django.conf import settings
+from django.db import connection, models
+
+from pulpcore.app import pulp_hashlib
+from pulpcore.plugin.models import Artifact
 
 from pulp_2to3_migration.app.constants import DEFAULT_BATCH_SIZE
-from pulp_2to3_migration.app.models import Pulp2to3Content, Pulp2RepoContent
+from pulp_2to3_migration.app.models import Pulp2Content, Pulp2to3Content, Pulp2RepoContent
 
 from pulp_rpm.app.comps import dict_digest
 from pulp_rpm.app.advisory import hash_update_record
@@ -46,7 +52,8 @@ from .erratum import (
     get_package_checksum,
     get_pulp2_filtered_collections,
 )
-from .xml_utils import get_cr_obj
+from .package_creation import create_package_dicts_in_pool
+from .xml_utils import get_cr_obj, get_cr_objs
 
 SRPM_UNIT_FIELDS = set(
     [
@@ -66,6 +73,29 @@ SRPM_UNIT_FIELDS = set(
 
 RPM_UNIT_FIELDS = SRPM_UNIT_FIELDS | set(["is_modular"])
 
+# treeinfo files read during the current content migration, keyed on the Pulp 2 storage path of
+# a distribution tree, see ``Pulp2Distribution.read_treeinfo``
+_treeinfo_cache = {}
+
+
+def clear_treeinfo_cache():
+    """
+    Forget all the treeinfo files read so far, it's done at the end of each content migration.
+    """
+    _treeinfo_cache.clear()
+
+
+# data of the recently built advisories, see ``Pulp2Erratum.create_pulp3_content``
+_advisory_cache = OrderedDict()
+ADVISORY_CACHE_MAX_SIZE = 10000
+
+
+def clear_advisory_cache():
+    """
+    Forget all the advisories built so far, it's done at the end of each content migration.
+    """
+    _advisory_cache.clear()
+
 
 class Pulp2RpmBase(Pulp2to3Content):
     """
@@ -152,6 +182,24 @@ class Pulp2RpmBase(Pulp2to3Content):
         pkg_dict["is_modular"] = self.is_modular
         return (Package(**pkg_dict), None)
 
+    @classmethod
+    def create_pulp3_content_batch(cls, batch):
+        """
+        Create Pulp 3 Package content for a batch of packages, parsing their metadata at once.
+
+        If ``RPM_CONTENT_CREATION_PROCESSES`` is set, metadata is parsed in worker processes.
+        """
+        if settings.RPM_CONTENT_CREATION_PROCESSES and batch:
+            pkg_dicts = create_package_dicts_in_pool(batch)
+        else:
+            pkg_dicts = [Package.createrepo_to_dict(cr_pkg) for cr_pkg in get_cr_objs(batch)]
+
+        packages = []
+        for pulp2rpm, pkg_dict in zip(batch, pkg_dicts):
+            pkg_dict["is_modular"] = pulp2rpm.is_modular
+            packages.append((Package(**pkg_dict), None))
+        return packages
+
 
 class Pulp2Rpm(Pulp2RpmBase):
     """
@@ -233,7 +281,7 @@ class Pulp2Erratum(Pulp2to3Content):
 
     pulp2_type = "erratum"
     set_pulp2_repo = True
-    cached_repo_data = {}
+    cached_repo_data = OrderedDict()
 
     class Meta:
         unique_together = ("errata_id", "repo_id")
@@ -244,20 +292,22 @@ class Pulp2Erratum(Pulp2to3Content):
         """
         Get content data of a repository, NEVRA of packages and NSVCA of modules.
 
+        Data of the recently used repositories is cached, the least recently used ones are
+        evicted when the number of cached NEVRA and NSVCA tuples exceeds the
+        ``ERRATUM_REPO_DATA_CACHE_SIZE`` setting.
+
         Args:
             pulp2_repo(Pulp2Repository): a pre-migrated repo to collect data from
 
         Returns:
-            dict: {'packages': list of NEVRA tuples of the packages which are in this repo,
-                   'modules': list of NSVCA tuples of the module which are in this repo}
+            dict: {'packages': frozenset of NEVRA tuples of the packages which are in this repo,
+                   'modules': frozenset of NSVCA tuples of the module which are in this repo}
 
         """
         if pulp2_repo.pk in cls.cached_repo_data:
+            cls.cached_repo_data.move_to_end(pulp2_repo.pk)
             return cls.cached_repo_data[pulp2_repo.pk]
 
-        repo_pkg_nevra = []
-        repo_module_nsvca = []
-
         # gather info about available packages
         package_pulp2_ids = (
             Pulp2RepoContent.objects.filter(
@@ -270,16 +320,16 @@ class Pulp2Erratum(Pulp2to3Content):
         pulp2rpms = Pulp2Rpm.objects.filter(pulp2content__pulp2_id__in=package_pulp2_ids).values(
             "name", "epoch", "version", "release", "arch"
         )
-        for pkg in pulp2rpms.iterator():
-            repo_pkg_nevra.append(
-                (
-                    pkg["name"],
-                    pkg.get("epoch", "0"),
-                    pkg["version"],
-                    pkg["release"],
-                    pkg["arch"],
-                )
+        repo_pkg_nevra = frozenset(
+            (
+                pkg["name"],
+                pkg.get("epoch", "0"),
+                pkg["version"],
+                pkg["release"],
+                pkg["arch"],
             )
+            for pkg in pulp2rpms.iterator()
+        )
 
         # gather info about available modules
         modulemd_pulp2_ids = (
@@ -293,26 +343,109 @@ class Pulp2Erratum(Pulp2to3Content):
         pulp2modulemds = Pulp2Modulemd.objects.filter(
             pulp2content__pulp2_id__in=modulemd_pulp2_ids
         ).values("name", "stream", "version", "context", "arch")
-        for module in pulp2modulemds.iterator():
-            repo_module_nsvca.append(
-                (
-                    module["name"],
-                    module["stream"],
-                    module["version"],
-                    module["context"],
-                    module["arch"],
-                )
+        repo_module_nsvca = frozenset(
+            (
+                module["name"],
+                module["stream"],
+                module["version"],
+                module["context"],
+                module["arch"],
             )
+            for module in pulp2modulemds.iterator()
+        )
 
-        # data for only one repo is cached (it should be enough, because content is ordered by
-        # a repo it belongs to)
-        cls.cached_repo_data.clear()
         cls.cached_repo_data[pulp2_repo.pk] = {
             "packages": repo_pkg_nevra,
             "modules": repo_module_nsvca,
         }
+        cls.evict_repo_data()
         return cls.cached_repo_data[pulp2_repo.pk]
 
+    @classmethod
+    def evict_repo_data(cls):
+        """
+        Evict data of the least recently used repositories if the cache is over its budget.
+
+        Data of the most recently used repository is always kept.
+        """
+        # content is ordered by a repo it belongs to, so usually data for only one repo is needed
+        # at a time, however errata of the same repo can be migrated in several shards
+        cached_size = sum(
+            len(repo_data["packages"]) + len(repo_data["modules"])
+            for repo_data in cls.cached_repo_data.values()
+        )
+        while cached_size > settings.ERRATUM_REPO_DATA_CACHE_SIZE and len(cls.cached_repo_data) > 1:
+            _repo_pk, repo_data = cls.cached_repo_data.popitem(last=False)
+            cached_size -= len(repo_data["packages"]) + len(repo_data["modules"])
+
+    @classmethod
+    def cache_repo_data(cls, pulp2_repos):
+        """
+        Get content data of several repositories at once and cache it, see ``get_repo_data``.
+
+        NEVRA of packages and NSVCA of modules of all the repositories which are not cached yet
+        are fetched with one query per content type.
+
+        Args:
+            pulp2_repos(iterable): pre-migrated repos to collect data from
+
+        """
+        repo_pks = {
+            str(pulp2_repo.pk)
+            for pulp2_repo in pulp2_repos
+            if pulp2_repo.pk not in cls.cached_repo_data
+        }
+        if not repo_pks:
+            return
+
+        repocontent_table = Pulp2RepoContent._meta.db_table
+        pulp2content_table = Pulp2Content._meta.db_table
+        package_fields = ("name", "epoch", "version", "release", "arch")
+        module_fields = ("name", "stream", "version", "context", "arch")
+        repo_data = defaultdict(lambda: {"packages": set(), "modules": set()})
+        for key, content_type, detail_model, fields in (
+            ("packages", "rpm", Pulp2Rpm, package_fields),
+            ("modules", "modulemd", Pulp2Modulemd, module_fields),
+        ):
+            columns = ", ".join(f"detail.{field}" for field in fields)
+            query = f"""
+                SELECT rc.pulp2_repository_id, {columns}
+                  FROM {repocontent_table} AS rc
+                  INNER JOIN {pulp2content_table} AS c ON
+                    (c.pulp2_id = rc.pulp2_unit_id
+                     AND c.pulp2_content_type_id = rc.pulp2_content_type_id)
+                  INNER JOIN {detail_model._meta.db_table} AS detail ON
+                    detail.pulp2content_id = c.pulp_id
+                 WHERE rc.pulp2_content_type_id = %s
+                   AND rc.pulp2_repository_id = ANY(%s::uuid[])
+            """
+            with connection.cursor() as cursor:
+                cursor.execute(query, [content_type, list(repo_pks)])
+                for repo_pk, *unit_fields in cursor.fetchall():
+                    repo_data[repo_pk][key].add(tuple(unit_fields))
+
+        for pulp2_repo in pulp2_repos:
+            if pulp2_repo.pk in cls.cached_repo_data:
+                continue
+            data = repo_data.get(pulp2_repo.pk, {"packages": (), "modules": ()})
+            cls.cached_repo_data[pulp2_repo.pk] = {
+                "packages": frozenset(data["packages"]),
+                "modules": frozenset(data["modules"]),
+            }
+        cls.evict_repo_data()
+
+    @classmethod
+    def create_pulp3_content_batch(cls, batch):
+        """
+        Create Pulp 3 Advisories for a batch of errata.
+
+        Content data of all the repositories of the batch is cached at once beforehand.
+        """
+        cls.cache_repo_data(
+            {pulp2erratum.pulp2content.pulp2_repo for pulp2erratum in batch} - {None}
+        )
+        return super().create_pulp3_content_batch(batch)
+
     @classmethod
     def pre_migrate_content_detail(cls, content_batch):
         """
@@ -323,28 +456,33 @@ class Pulp2Erratum(Pulp2to3Content):
 
         """
 
-        def get_pkglist(errata_id):
+        def get_pkglists(errata_ids):
             """
-            Get a pkglist for a specified erratum.
+            Get pkglists for the specified errata.
 
             In Pulp 2 many pkglists are present for each erratum, including duplicated ones.
-            The aggregation pipeline generates unique collections grouped by module info.
+            The aggregation pipeline generates unique collections grouped by erratum and module
+            info, for all the errata at once.
 
             Ported from Pulp 2 Errata serializer
             https://github.com/pulp/pulp_rpm/blob/91145f24afed19812e3b53805c2bfd69fd24764a/plugins/pulp_rpm/plugins/serializers.py#L53
 
             Args:
-                errata_id(str): Id of an erratum to get a pkglist for
+                errata_ids(list): Ids of errata to get pkglists for
+
+            Returns:
+                dict: pkglists keyed on the erratum id, errata without pkglists are not included
+
             """
-            match_stage = {"$match": {"errata_id": errata_id}}
+            match_stage = {"$match": {"errata_id": {"$in": list(errata_ids)}}}
             unwind_collections_stage = {"$unwind": "$collections"}
             unwind_packages_stage = {"$unwind": "$collections.packages"}
 
             # Group all packages by their relation to a module specified in each collection.
-            # All non-modular RPMs will be in a single collection.
+            # All non-modular RPMs of an erratum will be in a single collection.
             group_stage = {
                 "$group": {
-                    "_id": "$collections.module",
+                    "_id": {"errata_id": "$errata_id", "module": "$collections.module"},
                     "packages": {"$addToSet": "$collections.packages"},
                 }
             }
@@ -356,20 +494,21 @@ class Pulp2Erratum(Pulp2to3Content):
                 allowDiskUse=True,
             )
 
-            pkglist = []
-            for collection_idx, collection in enumerate(collections):
+            pkglists = defaultdict(list)
+            for collection in collections:
+                pkglist = pkglists[collection["_id"]["errata_id"]]
                 # To preserve the original format of a pkglist the 'short' and 'name'
                 # keys are added. 'short' can be an empty string, collection 'name'
                 # should be unique within an erratum.
                 item = {
                     "packages": collection["packages"],
                     "short": "",
-                    "name": "collection-%s" % collection_idx,
+                    "name": "collection-%s" % len(pkglist),
                 }
-                if collection["_id"]:
-                    item["module"] = collection["_id"]
+                if collection["_id"].get("module"):
+                    item["module"] = collection["_id"]["module"]
                 pkglist.append(item)
-            return pkglist
+            return pkglists
 
         pulp2_id_obj_map = defaultdict(dict)
         pulp2erratum_to_save = []
@@ -377,7 +516,9 @@ class Pulp2Erratum(Pulp2to3Content):
             repo_id = pulp2content.pulp2_repo.pk
             pulp2_id_obj_map[pulp2content.pulp2_id][repo_id] = pulp2content
         pulp2_ids = pulp2_id_obj_map.keys()
-        pulp2_erratum_content_batch = pulp2_models.Errata.objects.filter(id__in=pulp2_ids)
+        pulp2_erratum_content_batch = list(pulp2_models.Errata.objects.filter(id__in=pulp2_ids))
+        # the same erratum can be present in many repos, get its pkglist only once
+        pkglists = get_pkglists({erratum.errata_id for erratum in pulp2_erratum_content_batch})
         for erratum in pulp2_erratum_content_batch:
             for repo_id, pulp2content in pulp2_id_obj_map[erratum.id].items():
                 pulp2erratum_to_save.append(
@@ -399,7 +540,7 @@ class Pulp2Erratum(Pulp2to3Content):
                         version=erratum.version,
                         release=erratum.release,
                         errata_type=erratum.type,
-                        pkglist=get_pkglist(erratum.errata_id),
+                        pkglist=pkglists.get(erratum.errata_id, []),
                         title=erratum.title,
                         solution=erratum.solution,
                         summary=erratum.summary,
@@ -418,9 +559,17 @@ class Pulp2Erratum(Pulp2to3Content):
         repo_data = Pulp2Erratum.get_repo_data(self.pulp2content.pulp2_repo)
         return get_pulp2_filtered_collections(self, repo_data["packages"], repo_data["modules"])
 
-    def create_pulp3_content(self):
+    def build_advisory_data(self, collections):
         """
-        Create a Pulp 3 Advisory content for saving it later in a bulk operation.
+        Build data for an advisory with the specified collections.
+
+        Args:
+            collections(list): collections of the advisory, filtered for the repo it belongs to
+
+        Returns:
+            tuple: UpdateRecord data, its digest, a list of UpdateCollection data with the data of
+                   its packages, and a list of UpdateReference data
+
         """
         rec = cr.UpdateRecord()
         rec.fromstr = self.errata_from
@@ -440,7 +589,6 @@ class Pulp2Erratum(Pulp2to3Content):
         rec.release = self.release
         rec.pushcount = self.pushcount
 
-        collections = self.get_collections()
         for collection in collections:
             col = cr.UpdateCollection()
             col.shortname = collection.get("short")
@@ -482,21 +630,59 @@ class Pulp2Erratum(Pulp2to3Content):
             ref.title = reference.get("title")
             rec.append_reference(ref)
 
-        update_record = UpdateRecord(**UpdateRecord.createrepo_to_dict(rec))
-        update_record.digest = hash_update_record(rec)
+        collection_dicts = [
+            (
+                UpdateCollection.createrepo_to_dict(collection),
+                [
+                    UpdateCollectionPackage.createrepo_to_dict(package)
+                    for package in collection.packages
+                ],
+            )
+            for collection in rec.collections
+        ]
+        reference_dicts = [
+            UpdateReference.createrepo_to_dict(reference) for reference in rec.references
+        ]
+        return (
+            UpdateRecord.createrepo_to_dict(rec),
+            hash_update_record(rec),
+            collection_dicts,
+            reference_dicts,
+        )
+
+    def create_pulp3_content(self):
+        """
+        Create a Pulp 3 Advisory content for saving it later in a bulk operation.
+
+        An erratum is usually present in many repos and is migrated with the same collections
+        for most of them, so the advisory data is built and hashed only once for each set of
+        collections.
+        """
+        collections = self.get_collections()
+        collections_digest = hashlib.sha256(
+            json.dumps(collections, sort_keys=True).encode()
+        ).hexdigest()
+        cache_key = (self.errata_id, self.updated, collections_digest)
+        if cache_key in _advisory_cache:
+            _advisory_cache.move_to_end(cache_key)
+        else:
+            _advisory_cache[cache_key] = self.build_advisory_data(collections)
+            if len(_advisory_cache) > ADVISORY_CACHE_MAX_SIZE:
+                _advisory_cache.popitem(last=False)
+        record_dict, digest, collection_dicts, reference_dicts = _advisory_cache[cache_key]
+
+        # new instances are created every time, they are saved separately for each advisory
+        update_record = UpdateRecord(**record_dict)
+        update_record.digest = digest
         relations = {"collections": defaultdict(list), "references": []}
 
-        for collection in rec.collections:
-            coll_dict = UpdateCollection.createrepo_to_dict(collection)
+        for coll_dict, pkg_dicts in collection_dicts:
             coll = UpdateCollection(**coll_dict)
-
-            for package in collection.packages:
-                pkg_dict = UpdateCollectionPackage.createrepo_to_dict(package)
+            for pkg_dict in pkg_dicts:
                 pkg = UpdateCollectionPackage(**pkg_dict)
                 relations["collections"][coll].append(pkg)
 
-        for reference in rec.references:
-            reference_dict = UpdateReference.createrepo_to_dict(reference)
+        for reference_dict in reference_dicts:
             ref = UpdateReference(**reference_dict)
             relations["references"].append(ref)
 
@@ -826,50 +1012,94 @@ class Pulp2Distribution(Pulp2to3Content):
             batch_size=DEFAULT_BATCH_SIZE,
         )
 
-    def get_treeinfo_serialized(self):
+    def read_treeinfo(self):
         """
-        Create a Pulp 3 Distribution content for saving later in a bulk operation.
+        Read, parse and hash the treeinfo file of the distribution tree.
+
+        The result is cached for the duration of the content migration, so each treeinfo file
+        is read only once, no matter how many times it's needed.
 
         Returns:
-            dict: a serialized treeinfo data, or None if no treeinfo can be found.
+            dict: ``filename`` of the treeinfo, its ``parsed_sections``, ``digests`` and ``size``,
+                  or None if no treeinfo can be found.
 
         """
+        base_path = self.pulp2content.pulp2_storage_path
+        if base_path in _treeinfo_cache:
+            return _treeinfo_cache[base_path]
+
+        treeinfo_data = None
         namespaces = [".treeinfo", "treeinfo"]
         for namespace in namespaces:
-            treeinfo = PulpTreeInfo()
-            treeinfo_path = os.path.join(self.pulp2content.pulp2_storage_path, namespace)
+            treeinfo_path = os.path.join(base_path, namespace)
             try:
-                treeinfo.load(f=treeinfo_path)
+                with open(treeinfo_path, "rb") as treeinfo_fd:
+                    content = treeinfo_fd.read()
             except FileNotFoundError:
                 continue
 
-            with open(treeinfo_path, "rb") as treeinfo_fd:
-                treeinfo_digest = hashlib.sha256(treeinfo_fd.read()).hexdigest()
-            self.filename = namespace
-            treeinfo_parsed = treeinfo.parsed_sections()
-            treeinfo_serialized = TreeinfoData(treeinfo_parsed).to_dict(filename=namespace)
-            # Pulp 2 only knows about the top level kickstart repository
-            treeinfo_serialized["repositories"] = {".": None}
-            # Pulp 2 did not support addon repositories, so we should not list them here either
-            treeinfo_serialized["addons"] = {}
-            # Pulp 2 only supported variants that are in the root of the repository
-            variants = {}
-            for name, variant in treeinfo_serialized["variants"].items():
-                if variant["repository"] == ".":
-                    variants[name] = variant
-            treeinfo_serialized["variants"] = variants
-            # Set older timestamp so Pulp will fetch all the addons during the next sync
-            # We can't reset it to 0, some creative repository providers use the same
-            # name/release in many distribution trees and the only way to distinguish tem is by
-            # the build timestamp. e.g. CentOS 8 BaseOs, Appstream, PowerTools, HighAvailability.
-            orig_build_timestamp = int(
-                float(treeinfo_serialized["distribution_tree"]["build_timestamp"])
-            )
-            treeinfo_serialized["distribution_tree"]["build_timestamp"] = orig_build_timestamp - 1
-            treeinfo_serialized["distribution_tree"]["digest"] = treeinfo_digest
-            return treeinfo_serialized
+            treeinfo = PulpTreeInfo()
+            treeinfo.load(f=io.StringIO(content.decode("utf-8")))
+            treeinfo_data = {
+                "filename": namespace,
+                "parsed_sections": treeinfo.parsed_sections(),
+                "digests": {
+                    algorithm: pulp_hashlib.new(algorithm, content).hexdigest()
+                    for algorithm in Artifact.DIGEST_FIELDS
+                },
+                "size": len(content),
+            }
+            break
+
+        _treeinfo_cache[base_path] = treeinfo_data
+        return treeinfo_data
+
+    def get_treeinfo_digests(self):
+        """
+        Returns:
+            dict: All the digests of the treeinfo file, or None if no treeinfo can be found.
 
-        return None
+        """
+        treeinfo_data = self.read_treeinfo()
+        return treeinfo_data["digests"] if treeinfo_data else None
+
+    def get_treeinfo_serialized(self):
+        """
+        Create a Pulp 3 Distribution content for saving later in a bulk operation.
+
+        Returns:
+            dict: a serialized treeinfo data, or None if no treeinfo can be found.
+
+        """
+        treeinfo_data = self.read_treeinfo()
+        if treeinfo_data is None:
+            return None
+
+        namespace = treeinfo_data["filename"]
+        self.filename = namespace
+        treeinfo_serialized = TreeinfoData(treeinfo_data["parsed_sections"]).to_dict(
+            filename=namespace
+        )
+        # Pulp 2 only knows about the top level kickstart repository
+        treeinfo_serialized["repositories"] = {".": None}
+        # Pulp 2 did not support addon repositories, so we should not list them here either
+        treeinfo_serialized["addons"] = {}
+        # Pulp 2 only supported variants that are in the root of the repository
+        variants = {}
+        for name, variant in treeinfo_serialized["variants"].items():
+            if variant["repository"] == ".":
+                variants[name] = variant
+        treeinfo_serialized["variants"] = variants
+        # Set older timestamp so Pulp will fetch all the addons during the next sync
+        # We can't reset it to 0, some creative repository providers use the same
+        # name/release in many distribution trees and the only way to distinguish tem is by
+        # the build timestamp. e.g. CentOS 8 BaseOs, Appstream, PowerTools, HighAvailability.
+        orig_build_timestamp = int(
+            float(treeinfo_serialized["distribution_tree"]["build_timestamp"])
+        )
+        treeinfo_serialized["distribution_tree"]["build_timestamp"] = orig_build_timestamp - 1
+        treeinfo_serialized["distribution_tree"]["digest"] = treeinfo_data["digests"]["sha256"]
+        return treeinfo_serialized
 
     def create_pulp3_content(self):
         """
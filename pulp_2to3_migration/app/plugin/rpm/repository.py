@@ -1,15 +1,142 @@
+import hashlib
+import json
+
+from django.db import transaction
+
+from pulpcore.plugin.models import ContentArtifact, PublishedArtifact, PublishedMetadata
+
+from pulp_2to3_migration.app.constants import DEFAULT_BATCH_SIZE
+from pulp_2to3_migration.app.models import Pulp2Distributor, Pulp2Repository
 from pulp_2to3_migration.app.plugin.api import (
     is_different_relative_url,
     Pulp2to3Importer,
     Pulp2to3Distributor,
 )
 
+from pulp_rpm.app.constants import CHECKSUM_TYPES
 from pulp_rpm.app.models import RpmRemote, RpmPublication, RpmDistribution
 from pulp_rpm.app.tasks.publishing import publish
 
 from urllib.parse import urlparse, urlunparse
 
 
+def get_package_checksum_type(repo_version):
+    """
+    Get a checksum type of packages in a repository version.
+
+    It's found during pre-migration for the Pulp 2 repository the repository version was created
+    for. If it's not known, the checksum type of any package in the repository version is used.
+
+    Args:
+        repo_version(RepositoryVersion): a repository version to get a checksum type for
+
+    Returns:
+        str: a Pulp 3 checksum type of packages or None if there are no packages
+
+    """
+    pulp2_checksum_type = (
+        Pulp2Repository.objects.filter(
+            pulp3_repository_version=repo_version, package_checksum_type__isnull=False
+        )
+        .values_list("package_checksum_type", flat=True)
+        .first()
+    )
+    if pulp2_checksum_type:
+        # e.g. 'sha' in Pulp 2 is 'sha1' in Pulp 3
+        return getattr(CHECKSUM_TYPES, pulp2_checksum_type.upper(), pulp2_checksum_type)
+
+    package = repo_version.content.filter(pulp_type="rpm.package").first()
+    if package:
+        return package.cast().checksum_type
+
+
+def get_publication_fingerprint(repo_version, checksum_types, sqlite):
+    """
+    Calculate a fingerprint of a publication which would be created for a repository version.
+
+    Publications of repository versions with the same content and the same publish options
+    are identical.
+
+    Args:
+        repo_version(RepositoryVersion): a repository version to publish
+        checksum_types(dict): checksum types for metadata and packages, if any
+        sqlite(bool): whether metadata files in sqlite format are generated
+
+    Returns:
+        str: a hex digest of the content and the publish options
+
+    """
+    repository = repo_version.repository.cast()
+    publish_options = {
+        "checksum_types": checksum_types,
+        "sqlite_metadata": sqlite,
+        "original_checksum_types": repository.original_checksum_types,
+    }
+    fingerprint = hashlib.sha256(json.dumps(publish_options, sort_keys=True).encode())
+    content_pks = repo_version.content.order_by("pk").values_list("pk", flat=True)
+    for content_pk in content_pks.iterator():
+        fingerprint.update(content_pk.bytes)
+    return fingerprint.hexdigest()
+
+
+def clone_publication(publication, repo_version):
+    """
+    Create a publication for a repository version as a copy of an identical publication.
+
+    Published metadata files are not generated again, the new publication refers to the same
+    artifacts.
+
+    Args:
+        publication(RpmPublication): a complete publication of the same content with the same
+                                     publish options
+        repo_version(RepositoryVersion): a repository version to create a publication for
+
+    Returns:
+        RpmPublication: a new complete publication
+
+    """
+    with transaction.atomic():
+        with RpmPublication.create(repo_version, pass_through=publication.pass_through) as clone:
+            clone.metadata_checksum_type = publication.metadata_checksum_type
+            clone.package_checksum_type = publication.package_checksum_type
+            clone.gpgcheck = publication.gpgcheck
+            clone.repo_gpgcheck = publication.repo_gpgcheck
+            clone.sqlite_metadata = publication.sqlite_metadata
+
+            # published metadata is content of a publication, it's copied with its artifacts
+            cloned_content_artifacts = {}
+            for metadata in PublishedMetadata.objects.filter(publication=publication):
+                cloned_metadata = PublishedMetadata(
+                    relative_path=metadata.relative_path, publication=clone
+                )
+                cloned_metadata.save()
+                for content_artifact in metadata.contentartifact_set.all():
+                    cloned_content_artifact = ContentArtifact(
+                        artifact_id=content_artifact.artifact_id,
+                        content=cloned_metadata,
+                        relative_path=content_artifact.relative_path,
+                    )
+                    cloned_content_artifact.save()
+                    cloned_content_artifacts[content_artifact.pk] = cloned_content_artifact.pk
+
+            published_artifacts = PublishedArtifact.objects.filter(publication=publication)
+            PublishedArtifact.objects.bulk_create(
+                [
+                    PublishedArtifact(
+                        relative_path=published_artifact.relative_path,
+                        content_artifact_id=cloned_content_artifacts.get(
+                            published_artifact.content_artifact_id,
+                            published_artifact.content_artifact_id,
+                        ),
+                        publication=clone,
+                    )
+                    for published_artifact in published_artifacts.iterator()
+                ],
+                batch_size=DEFAULT_BATCH_SIZE,
+            )
+    return clone
+
+
 class RpmImporter(Pulp2to3Importer):
     """
     Interface to migrate Pulp 2 RPM importer
@@ -72,6 +199,8 @@ class RpmDistributor(Pulp2to3Distributor):
             repo = pulp2distributor.pulp2_repos.filter(not_in_plan=False, is_migrated=True)
             repo_version = repo[0].pulp3_repository_version
         publication = repo_version.publication_set.filter(complete=True).first()
+        # it's not known how an existing publication was created
+        pulp2distributor.pulp3_publication_fingerprint = None
         if not publication:
             pulp2_checksum_type = pulp2_config.get("checksum_type")
             checksum_types = None
@@ -84,24 +213,40 @@ class RpmDistributor(Pulp2to3Distributor):
                 # Set the checksum type based on content in a repo, pulp 2 supports only one
                 # checksum type for packages in a repo. It is important to set checksum type for
                 # Pulp 3 to Pulp 2 sync use case.
-                package_qs = repo_version.content.filter(pulp_type="rpm.package")
-                if package_qs.count():
-                    pkg_checksum_type = package_qs.first().cast().checksum_type
+                pkg_checksum_type = get_package_checksum_type(repo_version)
+                if pkg_checksum_type:
                     checksum_types = {
                         "metadata": pkg_checksum_type,
                         "package": pkg_checksum_type,
                     }
             sqlite = pulp2_config.get("generate_sqlite", False)
-            try:
-                publish(
-                    repo_version.pk,
-                    checksum_types=checksum_types,
-                    sqlite_metadata=sqlite,
+
+            # many Pulp 2 repos can have the same content, e.g. content views in Katello,
+            # don't generate the same metadata again
+            fingerprint = get_publication_fingerprint(repo_version, checksum_types, sqlite)
+            identical_dist = (
+                Pulp2Distributor.objects.filter(
+                    pulp3_publication_fingerprint=fingerprint, pulp3_publication__complete=True
                 )
-            except TypeError:
-                # hack, pulp_rpm <3.9 doesn't support sqlite_metadata kwarg
-                publish(repo_version.pk, checksum_types=checksum_types)
-            publication = repo_version.publication_set.filter(complete=True).first()
+                .select_related("pulp3_publication")
+                .first()
+            )
+            if identical_dist:
+                publication = clone_publication(
+                    identical_dist.pulp3_publication.cast(), repo_version
+                )
+            else:
+                try:
+                    publish(
+                        repo_version.pk,
+                        checksum_types=checksum_types,
+                        sqlite_metadata=sqlite,
+                    )
+                except TypeError:
+                    # hack, pulp_rpm <3.9 doesn't support sqlite_metadata kwarg
+                    publish(repo_version.pk, checksum_types=checksum_types)
+                publication = repo_version.publication_set.filter(complete=True).first()
+            pulp2distributor.pulp3_publication_fingerprint = fingerprint
 
         # create distribution
         distribution_data = cls.parse_base_config(pulp2distributor, pulp2_config)
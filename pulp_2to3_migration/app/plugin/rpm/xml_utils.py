@@ -6,8 +6,10 @@ Mostly ported from Pulp 2.
 """
 
 import gzip
+import logging
 import re
-from collections import namedtuple
+from collections import defaultdict, deque, namedtuple
+from gettext import gettext as _
 
 import createrepo_c as cr
 from django.template import (
@@ -15,7 +17,9 @@ from django.template import (
     Template,
 )
 from django.template.defaulttags import TemplateTagNode
+from django.utils.html import escape
 
+_logger = logging.getLogger(__name__)
 
 ESCAPE_TEMPLATE_VARS_TAGS = {
     "primary": ("description", "summary"),
@@ -27,6 +31,8 @@ METADATA_TYPES = ("primary", "other", "filelists")
 XmlElement = namedtuple("xml_element", ["start", "end"])
 TEMPLATETAG_MAP = dict((sym, name) for name, sym in TemplateTagNode.mapping.items())
 SYMBOLS_PATTERN = "(%s)" % "|".join(TEMPLATETAG_MAP.keys())
+# the same as django.template.base.tag_re, to find the template syntax the same way Django does
+TEMPLATE_SYNTAX_RE = re.compile(r"({%.*?%}|{{.*?}}|{#.*?#})")
 
 
 def _substitute_special_chars(template):
@@ -67,6 +73,24 @@ def _generate_tag_replacement_str(mobj):
     return start_tag + value + end_tag
 
 
+def _get_tag_re(tag_name):
+    """
+    Build a regular expression to match an XML element and its value.
+
+    Args:
+        tag_name(str): name of the element to match
+
+    Returns:
+        re.Pattern: a compiled regular expression with 3 groups: opening tag, value and
+                    closing tag
+
+    """
+    start_tag_pattern = r"<%s.*?(?<!/)>" % tag_name
+    end_tag_pattern = r"</%s>" % tag_name
+    complete_tag_pattern = r"(%s)(.*)(%s)" % (start_tag_pattern, end_tag_pattern)
+    return re.compile(complete_tag_pattern, flags=re.DOTALL)
+
+
 def _escape_django_syntax_chars(template, tag_name):
     """
     Escape Django syntax characters by replacing them with the corresponding templatetag.
@@ -84,14 +108,106 @@ def _escape_django_syntax_chars(template, tag_name):
         str: a Django template with the escaped syntax characters in the specified element
 
     """
-    start_tag_pattern = r"<%s.*?(?<!/)>" % tag_name
-    end_tag_pattern = r"</%s>" % tag_name
-    complete_tag_pattern = r"(%s)(.*)(%s)" % (start_tag_pattern, end_tag_pattern)
-    tag_re = re.compile(complete_tag_pattern, flags=re.DOTALL)
+    tag_re = _get_tag_re(tag_name)
     template = tag_re.sub(_generate_tag_replacement_str, template)
     return template
 
 
+def _render_django_template(template, context, escape_tags):
+    """
+    Render a template with the Django template engine, as it's done in Pulp 2.
+
+    Args:
+        template(str): a metadata snippet template
+        context(dict): values of the template variables
+        escape_tags(tuple): names of the elements which values are not a part of the template
+
+    Returns:
+        str: a rendered metadata snippet
+
+    """
+    for tag in escape_tags:
+        template = _escape_django_syntax_chars(template, tag)
+    return Template(template).render(Context(context))
+
+
+def _substitute_variables(text, context):
+    """
+    Substitute the template variables in a text without the template engine.
+
+    Args:
+        text(str): a part of a template
+        context(dict): values of the template variables
+
+    Returns:
+        str: the text with the variables substituted, or None if the text contains any template
+             syntax other than the plain variables from the context
+
+    """
+    if "{" not in text:
+        return text
+
+    pieces = []
+    pos = 0
+    for match in TEMPLATE_SYNTAX_RE.finditer(text):
+        token = match.group(0)
+        name = token[2:-2].strip()
+        if not token.startswith("{{") or name not in context:
+            return None
+        pieces.append(text[pos : match.start()])
+        pieces.append(escape(context[name]))
+        pos = match.end()
+    pieces.append(text[pos:])
+
+    # an unclosed tag can be closed by the syntax outside of the text
+    literal_text = TEMPLATE_SYNTAX_RE.sub("", text)
+    if any(opening in literal_text for opening in ("{%", "{{", "{#")):
+        return None
+
+    return "".join(pieces)
+
+
+def render_template(template, context, escape_tags):
+    """
+    Render a metadata snippet template stored in Pulp 2.
+
+    Pulp 2 templates only use plain variables, e.g. ``{{ checksum }}``, so they are substituted
+    directly which is much faster than rendering the template with the Django template engine.
+    Values of the ``escape_tags`` elements are left intact, the same way as if their syntax
+    characters were escaped. If a template has any other template syntax, it's rendered with the
+    Django template engine.
+
+    Args:
+        template(str): a metadata snippet template
+        context(dict): values of the template variables
+        escape_tags(tuple): names of the elements which values are not a part of the template
+
+    Returns:
+        str: a rendered metadata snippet
+
+    """
+    regions = []
+    for tag in escape_tags:
+        match = _get_tag_re(tag).search(template)
+        if match:
+            regions.append(match.span(2))
+    regions.sort()
+
+    pieces = []
+    pos = 0
+    for start, end in regions + [(len(template), len(template))]:
+        if start < pos:
+            # overlapping elements, rare enough to not handle them here
+            return _render_django_template(template, context, escape_tags)
+        rendered = _substitute_variables(template[pos:start], context)
+        if rendered is None:
+            return _render_django_template(template, context, escape_tags)
+        pieces.append(rendered)
+        pieces.append(template[start:end])
+        pos = end
+    return "".join(pieces)
+
+
 def render_primary(template, checksum, checksumtype):
     """
     Render the primary XML with the requested checksum type and checksum.
@@ -105,10 +221,8 @@ def render_primary(template, checksum, checksumtype):
         str: a rendered primary.xml snippet
 
     """
-    for tag in ESCAPE_TEMPLATE_VARS_TAGS["primary"]:
-        template = _escape_django_syntax_chars(template, tag)
-    context = Context({"checksum": checksum, "checksumtype": checksumtype})
-    return Template(template).render(context)
+    context = {"checksum": checksum, "checksumtype": checksumtype}
+    return render_template(template, context, ESCAPE_TEMPLATE_VARS_TAGS["primary"])
 
 
 def render_other(template, checksum):
@@ -123,11 +237,8 @@ def render_other(template, checksum):
         str: a rendered other.xml snippet
 
     """
-
-    for tag in ESCAPE_TEMPLATE_VARS_TAGS["other"]:
-        template = _escape_django_syntax_chars(template, tag)
-    context = Context({"pkgid": checksum})
-    return Template(template).render(context)
+    context = {"pkgid": checksum}
+    return render_template(template, context, ESCAPE_TEMPLATE_VARS_TAGS["other"])
 
 
 def render_filelists(template, checksum):
@@ -142,10 +253,8 @@ def render_filelists(template, checksum):
         str: a rendered filelists.xml snippet
 
     """
-    for tag in ESCAPE_TEMPLATE_VARS_TAGS["filelists"]:
-        template = _escape_django_syntax_chars(template, tag)
-    context = Context({"pkgid": checksum})
-    return Template(template).render(context)
+    context = {"pkgid": checksum}
+    return render_template(template, context, ESCAPE_TEMPLATE_VARS_TAGS["filelists"])
 
 
 # Additional utils (not from pulp2) #
@@ -192,6 +301,125 @@ def get_cr_obj(pkg):
     return parse_repodata(primary_xml, filelists_xml, other_xml)
 
 
+def get_cr_objs(pkgs):
+    """
+    Convert pulp 2 package objects into createrepo_c ones, parsing metadata of all of them at once.
+
+    Args:
+        pkgs(list): pulp 2 packages to convert
+
+    Returns:
+        list: createrepo_c Package objects in the same order as the requested packages
+
+    """
+    primary_xmls = []
+    filelists_xmls = []
+    other_xmls = []
+    for pkg in pkgs:
+        primary_xmls.append(render_metadata(pkg, "primary"))
+        filelists_xmls.append(render_metadata(pkg, "filelists"))
+        other_xmls.append(render_metadata(pkg, "other"))
+    return parse_repodata_batch(primary_xmls, filelists_xmls, other_xmls)
+
+
+def _trim_changelogs(package):
+    """
+    Keep only the last 10 changelogs of a package, sorted by date.
+
+    Args:
+        package(createrepo_c.Package): a parsed package
+
+    """
+    changelogs = package.changelogs
+    # make sure the changelogs are sorted by date
+    changelogs.sort(key=lambda t: t[1])
+    # keep only the last 10 changelogs
+    package.changelogs = changelogs[-10:]
+
+
+def parse_repodata_batch(primary_xmls, filelists_xmls, other_xmls):
+    """
+    Parse repodata of multiple packages with one createrepo_c call per metadata type.
+
+    Snippets of all the packages are concatenated into one document per metadata type, so the
+    parser is set up only once for all of them. Filelists and other data are matched to the
+    packages by pkgId, in the order the packages are listed, so the same pkgId can appear more
+    than once. If the combined documents can't be parsed, e.g. one of the snippets is malformed,
+    or not all of the filelists and other data match the packages, every package is parsed
+    separately.
+
+    Args:
+        primary_xmls (list): strings containing primary.xml snippets of the packages
+        filelists_xmls (list): strings containing filelists.xml snippets of the packages
+        other_xmls (list): strings containing other.xml snippets of the packages
+
+    Returns:
+        list: createrepo_c package objects in the same order as the snippets
+
+    """
+    packages = []
+    packages_by_pkgid = defaultdict(deque)
+    matched = 0
+
+    def newpkgcb(pkgId, name, arch):
+        """
+        A callback which is used when a new package entry is encountered.
+
+        Args:
+            pkgId(str): pkgId of a package
+            name(str): name of a package
+            arch(str): arch of a package
+
+        Returns:
+            createrepo_c.Package: a package which parsed data should be added to or None if
+                                  a package with such pkgId is not expected.
+
+        """
+        nonlocal matched
+        queue = packages_by_pkgid.get(pkgId)
+        if not queue:
+            return None
+        matched += 1
+        return queue.popleft()
+
+    def match_by_pkgid():
+        nonlocal matched
+        matched = 0
+        packages_by_pkgid.clear()
+        for package in packages:
+            packages_by_pkgid[package.pkgId].append(package)
+
+    try:
+        cr.xml_parse_primary_snippet("".join(primary_xmls), pkgcb=packages.append, do_files=False)
+        if len(packages) != len(primary_xmls):
+            raise ValueError(_("Unexpected number of packages in primary metadata"))
+        match_by_pkgid()
+        cr.xml_parse_filelists_snippet("".join(filelists_xmls), newpkgcb=newpkgcb)
+        if matched != len(primary_xmls):
+            # the data of the packages which pkgId doesn't match would be lost
+            raise ValueError(_("Unexpected packages in filelists metadata"))
+        match_by_pkgid()
+        cr.xml_parse_other_snippet("".join(other_xmls), newpkgcb=newpkgcb)
+        if matched != len(primary_xmls):
+            raise ValueError(_("Unexpected packages in other metadata"))
+    except (cr.CreaterepoCError, ValueError) as exc:
+        _logger.debug(
+            _("Failed to parse metadata of {} packages at once, parsing one by one: {}").format(
+                len(primary_xmls), exc
+            )
+        )
+        return [
+            parse_repodata(primary_xml, filelists_xml, other_xml)
+            for primary_xml, filelists_xml, other_xml in zip(
+                primary_xmls, filelists_xmls, other_xmls
+            )
+        ]
+
+    for package in packages:
+        _trim_changelogs(package)
+    return packages
+
+
 def parse_repodata(primary_xml, filelists_xml, other_xml):
     """
     Parse repodata to extract package info.
@@ -236,12 +464,7 @@ def parse_repodata(primary_xml, filelists_xml, other_xml):
     cr.xml_parse_filelists_snippet(filelists_xml, newpkgcb=newpkgcb)
     cr.xml_parse_other_snippet(other_xml, newpkgcb=newpkgcb)
 
-    changelogs = package.changelogs
-    # make sure the changelogs are sorted by date
-    changelogs.sort(key=lambda t: t[1])
-    # keep only the last 10 changelogs
-    package.changelogs = changelogs[-10:]
-
+    _trim_changelogs(package)
     return package
 
 
@@ -1,15 +1,16 @@
+import inspect
 import logging
 
 from collections import namedtuple
 from datetime import datetime
 
 from django.conf import settings
-from django.db import transaction
+from django.db import connection, transaction
 from django.db.models import Max, Q
 from django.utils import timezone
 from django.core.paginator import Paginator
 
-from mongoengine.queryset.visitor import Q as mongo_Q
+from mongoengine.queryset.visitor import Q as mongo_Q, QNode
 
 from pulpcore.plugin.constants import TASK_STATES
 from pulpcore.plugin.models import (
@@ -23,6 +24,7 @@ from pulp_2to3_migration.app.models import (
     Pulp2Distributor,
     Pulp2Importer,
     Pulp2LazyCatalog,
+    Pulp2PendingContent,
     Pulp2RepoContent,
     Pulp2Repository,
     RepoSetup,
@@ -70,6 +72,7 @@ def pre_migrate_all_content(plan):
             if content_model.pulp2.TYPE_ID in plugin.migrator.premigrate_hook:
                 premigrate_hook = plugin.migrator.premigrate_hook[content_model.pulp2.TYPE_ID]
             pre_migrate_content_type(content_model, mutable_type, lazy_type, premigrate_hook)
+        plugin.migrator.finalize_pre_migration()
 
 
 def pre_migrate_content_type(content_model, mutable_type, lazy_type, premigrate_hook):
@@ -143,8 +146,20 @@ def pre_migrate_content_type(content_model, mutable_type, lazy_type, premigrate_
     )
 
     mongo_content_qs_list = []
+    premigrate_filter = None
     if premigrate_hook:
-        pulp2_content_ids = premigrate_hook()
+        if "last_updated" in inspect.signature(premigrate_hook).parameters:
+            premigrate_filter = premigrate_hook(last_updated=last_updated)
+        else:
+            premigrate_filter = premigrate_hook()
+    if isinstance(premigrate_filter, QNode):
+        # the filter is a part of the query, no need to fetch the ids of the content first
+        mongo_content_qs = content_model.pulp2.objects(
+            mongo_Q(_last_updated__gte=last_updated) & premigrate_filter
+        ).order_by("_last_updated")
+        mongo_content_qs_list.append(mongo_content_qs)
+    elif premigrate_hook:
+        pulp2_content_ids = premigrate_filter
         # Based on testing, 340000 uuids in BSON is about 16548955 bytes.
         # Max BSON size is 16777216 bytes.
         bson_limit = 340000
@@ -417,6 +432,7 @@ def pre_migrate_content_type(content_model, mutable_type, lazy_type, premigrate_
 
     if lazy_type:
         pre_migrate_lazycatalog(content_type)
+        enqueue_pending_content(content_type)
 
     pulp2content_pb.state = TASK_STATES.COMPLETED
     pulp2content_pb.save()
@@ -457,6 +473,62 @@ def pre_migrate_lazycatalog(content_type):
         Pulp2LazyCatalog.objects.bulk_create(pulp2lazycatalog, ignore_conflicts=True)
 
 
+def enqueue_pending_content(content_type):
+    """
+    Add pre-migrated content of a lazy type to the queue of content which needs to be migrated.
+
+    Content needs to be migrated if it hasn't been migrated yet or if it has lazy catalog entries
+    which haven't been migrated yet. Content which has stayed in the queue since the previous
+    migration run is marked to be retried.
+
+    Args:
+        content_type: A content type for which the queue should be populated
+    """
+    pending_table = Pulp2PendingContent._meta.db_table
+    pulp2content_table = Pulp2Content._meta.db_table
+    lce_table = Pulp2LazyCatalog._meta.db_table
+
+    # Both queries are served by indices which cover only content with something to migrate,
+    # so they are as expensive as the amount of such content and not as the total amount of
+    # content. The queue is keyed on pulp2content, so the pulp_id can be derived from it.
+    insert_new_query = f"""
+        INSERT INTO {pending_table}
+          (pulp_id, pulp_created, pulp_last_updated, pulp2content_id, pulp2_content_type_id,
+           reason)
+        SELECT md5({pulp2content_table}.pulp_id::text)::uuid, now(), now(),
+               {pulp2content_table}.pulp_id, {pulp2content_table}.pulp2_content_type_id, %s
+          FROM {pulp2content_table}
+         WHERE {pulp2content_table}.pulp2_content_type_id = %s
+           AND {pulp2content_table}.pulp3_content_id IS NULL
+        ON CONFLICT DO NOTHING
+    """
+    insert_new_lce_query = f"""
+        INSERT INTO {pending_table}
+          (pulp_id, pulp_created, pulp_last_updated, pulp2content_id, pulp2_content_type_id,
+           reason)
+        SELECT DISTINCT md5({pulp2content_table}.pulp_id::text)::uuid, now(), now(),
+               {pulp2content_table}.pulp_id, {pulp2content_table}.pulp2_content_type_id, %s
+          FROM {lce_table}
+          INNER JOIN {pulp2content_table} ON
+            ({lce_table}.pulp2_unit_id = {pulp2content_table}.pulp2_id
+             AND {pulp2content_table}.pulp2_content_type_id = %s)
+         WHERE {lce_table}.pulp2_content_type_id = %s
+           AND {lce_table}.is_migrated = false
+           AND {pulp2content_table}.pulp3_content_id IS NOT NULL
+        ON CONFLICT DO NOTHING
+    """
+
+    with transaction.atomic():
+        Pulp2PendingContent.objects.filter(pulp2_content_type_id=content_type).update(
+            reason=Pulp2PendingContent.RETRY
+        )
+        with connection.cursor() as cursor:
+            cursor.execute(insert_new_query, [Pulp2PendingContent.NEW, content_type])
+            cursor.execute(
+                insert_new_lce_query, [Pulp2PendingContent.NEW_LCE, content_type, content_type]
+            )
+
+
 def pre_migrate_all_without_content(plan):
     """
     Pre-migrate repositories, relations to their contents, importers and distributors.
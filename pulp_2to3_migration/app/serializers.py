@@ -17,13 +17,20 @@ from pulpcore.plugin.serializers import (
     ModelSerializer,
     DetailRelatedField,
     IdentityField,
+    RelatedField,
 )
 
+from pulp_2to3_migration.app.constants import (
+    SKIPPED_CONTENT_EXCLUDE,
+    SKIPPED_CONTENT_INCLUDE,
+    SKIPPED_CONTENT_ONLY,
+)
 from pulp_2to3_migration.app.json_schema import SCHEMA
 from .models import (
     MigrationPlan,
     Pulp2Content,
     Pulp2Repository,
+    Pulp2SkippedContent,
 )
 
 
@@ -136,6 +143,33 @@ class MigrationPlanRunSerializer(serializers.Serializer):
         default=False,
         write_only=True,
     )
+    skipped_content = serializers.ChoiceField(
+        help_text=_(
+            "What to do with the content skipped as corrupted or missing during previous "
+            "migration runs: ``include`` it (the default), migrate ``only`` it or ``exclude`` it. "
+            "Migrating only the skipped content is useful after repairing it in Pulp 2."
+        ),
+        choices=[SKIPPED_CONTENT_INCLUDE, SKIPPED_CONTENT_ONLY, SKIPPED_CONTENT_EXCLUDE],
+        required=False,
+        default=SKIPPED_CONTENT_INCLUDE,
+        write_only=True,
+    )
+
+
+class MigrationPlanCheckStorageSerializer(serializers.Serializer):
+    """
+    A serializer for checking Pulp 2 storage before running a migration plan.
+    """
+
+    verify_checksums = serializers.BooleanField(
+        help_text=_(
+            "If ``True``, checksums of Pulp 2 content are verified. Otherwise, only presence "
+            "and size of the files are checked."
+        ),
+        required=False,
+        default=False,
+        write_only=True,
+    )
 
 
 class Pulp2ContentSerializer(ModelSerializer):
@@ -195,6 +229,30 @@ class Pulp2ContentSerializer(ModelSerializer):
         model = Pulp2Content
 
 
+class Pulp2SkippedContentSerializer(ModelSerializer):
+    """
+    A serializer for the Pulp2SkippedContent model
+    """
+
+    pulp_href = IdentityField(view_name="pulp2skippedcontent-detail")
+    pulp2_id = serializers.CharField(source="pulp2content.pulp2_id", read_only=True)
+    pulp2_content_type_id = serializers.CharField(max_length=255)
+    pulp2_storage_path = serializers.CharField()
+    reason = serializers.ChoiceField(choices=Pulp2SkippedContent.REASON_CHOICES)
+    pulp2content = RelatedField(view_name="pulp2content-detail", read_only=True)
+
+    class Meta:
+        fields = ModelSerializer.Meta.fields + (
+            "pulp_last_updated",
+            "pulp2_id",
+            "pulp2_content_type_id",
+            "pulp2_storage_path",
+            "reason",
+            "pulp2content",
+        )
+        model = Pulp2SkippedContent
+
+
 class Pulp2RepositoriesSerializer(ModelSerializer):
     """
     A serializer for the Pulp2Repositories
@@ -18,3 +18,35 @@ CONTENT_PREMIGRATION_BATCH_SIZE = 1000
 # Since each deb_component creates a large number of Pulp2to3Content we need a much lower batch size
 # for this type, in order to avoid CursorNotFound errors!
 DEB_COMPONENT_BATCH_SIZE = 50
+
+# Number of threads used to check files in the Pulp 2 storage before the migration
+STORAGE_CHECK_WORKERS = 8
+
+# Number of threads used to place Pulp 2 files into the Pulp 3 storage during content migration
+CONTENT_COPY_WORKERS = 4
+
+# Create all the artifact directories in the Pulp 3 storage before content migration
+PRECREATE_ARTIFACT_DIRS = False
+
+# Split content migration into tasks of at most this number of content units of the same type,
+# so it can run on several workers in parallel. If not set, content is migrated in a single task.
+CONTENT_MIGRATION_SHARD_SIZE = None
+
+# Collect per-stage statistics during content migration and report them at the end of it
+CONTENT_MIGRATION_INSTRUMENTATION = False
+
+# Per Pulp 2 plugin configuration of the content migration pipeline, e.g.
+# {"rpm": {"maxsize": 10, "batch_size": 500, "stage_batch_sizes": {"ContentSaver": 1000}}}
+CONTENT_MIGRATION_PIPELINE = {}
+
+# Number of processes to create RPM packages in during content migration. If not set, packages
+# are created in the task process.
+RPM_CONTENT_CREATION_PROCESSES = None
+
+# Max number of package NEVRAs and module NSVCAs of the repositories which are kept in memory
+# during errata migration, data of the least recently used repositories is evicted first
+ERRATUM_REPO_DATA_CACHE_SIZE = 1000000
+
+# Max number of tasks creating publications and distributions in parallel. If not set, they are
+# created in the same task as repository versions of a repository.
+PARALLEL_PUBLICATION_TASKS = None
@@ -0,0 +1,279 @@
+import functools
+import hashlib
+import logging
+import os
+import time
+
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from gettext import gettext as _
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F
+
+from pulpcore.plugin.models import ProgressReport
+
+from pulp_2to3_migration.app.constants import DEFAULT_BATCH_SIZE
+from pulp_2to3_migration.app.models import (
+    Pulp2Content,
+    Pulp2SkippedContent,
+    Pulp2StorageCheck,
+)
+
+_logger = logging.getLogger(__name__)
+
+FAILED_STATUSES = [Pulp2StorageCheck.MISSING, Pulp2StorageCheck.CORRUPTED]
+HASHING_CHUNK_SIZE = 1024 * 1024
+
+
+def failed_storage_checks(content_types):
+    """
+    Return not yet migrated Pulp 2 content which failed its latest storage check.
+
+    A check is only taken into account if the content hasn't changed in Pulp 2 since then.
+
+    Args:
+        content_types(list): Pulp 2 content types to look for
+
+    Returns:
+        django.db.models.QuerySet: Pulp2Content with missing or corrupted files
+
+    """
+    return Pulp2Content.objects.filter(
+        pulp2_content_type_id__in=content_types,
+        pulp3_content=None,
+        storage_check__status__in=FAILED_STATUSES,
+        storage_check__pulp2_last_updated=F("pulp2_last_updated"),
+    )
+
+
+def record_failed_storage_checks(content_types):
+    """
+    Record content which failed its latest storage check as skipped during migration.
+
+    So the skipped content is known in one place, no matter whether it was found by the storage
+    check or during migration.
+
+    Args:
+        content_types(list): Pulp 2 content types to record the content for
+
+    """
+    failed_pulp2content = failed_storage_checks(content_types).select_related("storage_check")
+    skipped = [
+        Pulp2SkippedContent(
+            pulp2content=pulp2content,
+            pulp2_content_type_id=pulp2content.pulp2_content_type_id,
+            pulp2_storage_path=pulp2content.pulp2_storage_path or "",
+            reason=(
+                Pulp2SkippedContent.MISSING
+                if pulp2content.storage_check.status == Pulp2StorageCheck.MISSING
+                else Pulp2SkippedContent.CORRUPTED
+            ),
+        )
+        for pulp2content in failed_pulp2content.iterator()
+    ]
+    with transaction.atomic():
+        # re-create the records, so the time the content was last skipped is updated
+        Pulp2SkippedContent.objects.filter(
+            pulp2content__in=failed_storage_checks(content_types)
+        ).delete()
+        Pulp2SkippedContent.objects.bulk_create(skipped, batch_size=DEFAULT_BATCH_SIZE)
+
+
+def check_file(path, expected_digests=None, expected_size=None, verify_checksums=False):
+    """
+    Check that a file in Pulp 2 storage exists and has expected size and, optionally, digests.
+
+    Only digests of the checksum types allowed in Pulp 3 are verified.
+
+    Args:
+        path(str): Path to a file in Pulp 2 storage
+        expected_digests(dict): Keyed on the checksum type, the expected digests
+        expected_size(int): The expected size of the file in bytes
+        verify_checksums(bool): If True, the file is read and its digests are verified
+
+    Returns:
+        tuple: The status of the check and the size of the file in bytes
+
+    """
+    try:
+        size = os.stat(path).st_size
+    except (OSError, TypeError):
+        return Pulp2StorageCheck.MISSING, 0
+
+    if expected_size is not None and size != expected_size:
+        return Pulp2StorageCheck.CORRUPTED, size
+
+    hashers = {}
+    if verify_checksums and expected_digests:
+        hashers = {
+            algorithm: hashlib.new(algorithm)
+            for algorithm, digest in expected_digests.items()
+            if digest and algorithm in settings.ALLOWED_CONTENT_CHECKSUMS
+        }
+    if not hashers:
+        return Pulp2StorageCheck.OK, size
+
+    try:
+        with open(path, "rb") as fp:
+            for chunk in iter(functools.partial(fp.read, HASHING_CHUNK_SIZE), b""):
+                for hasher in hashers.values():
+                    hasher.update(chunk)
+    except OSError:
+        return Pulp2StorageCheck.MISSING, 0
+
+    for algorithm, hasher in hashers.items():
+        if hasher.hexdigest() != expected_digests[algorithm]:
+            return Pulp2StorageCheck.CORRUPTED, size
+
+    return Pulp2StorageCheck.OK, size
+
+
+def check_pulp2_storage(plan, verify_checksums=False):
+    """
+    Check Pulp 2 storage for downloaded content of the plugins in the migration plan.
+
+    Files are checked in parallel and the results are saved as Pulp2StorageCheck records.
+    Content which has already successfully passed a check is not checked again, unless it has
+    changed in Pulp 2 or checksums verification is requested and hasn't been done yet.
+
+    Content types without artifacts and multi-artifact content types are not checked.
+
+    Args:
+        plan (MigrationPlan): Migration Plan to use
+        verify_checksums (bool): If True, file digests are verified, otherwise only presence
+                                 and size of the files are checked.
+
+    """
+    stats = Counter()
+    checked_types = []
+    start = time.monotonic()
+
+    progress_data = dict(message="Checking Pulp 2 storage", code="checking.pulp2.storage", total=0)
+    with ProgressReport(**progress_data) as pb, ThreadPoolExecutor(
+        max_workers=settings.STORAGE_CHECK_WORKERS
+    ) as executor:
+        for plugin in plan.get_plugin_plans():
+            migrator = plugin.migrator
+            for content_type, content_model in migrator.content_models.items():
+                if (
+                    content_type in migrator.artifactless_types
+                    or content_type in migrator.multi_artifact_types
+                ):
+                    continue
+                checked_types.append(content_type)
+
+                passed_checks = Pulp2StorageCheck.objects.filter(
+                    pulp2content__pulp2_content_type_id=content_type,
+                    status=Pulp2StorageCheck.OK,
+                    pulp2_last_updated=F("pulp2content__pulp2_last_updated"),
+                )
+                if verify_checksums:
+                    passed_checks = passed_checks.filter(checksums_verified=True)
+
+                detail_qs = (
+                    content_model.objects.filter(
+                        pulp2content__pulp2_content_type_id=content_type,
+                        pulp2content__downloaded=True,
+                        pulp2content__pulp3_content=None,
+                    )
+                    .exclude(pulp2content__in=passed_checks.values("pulp2content"))
+                    .select_related("pulp2content")
+                )
+
+                pb.total += detail_qs.count()
+                pb.save()
+
+                batch = []
+                for detail_content in detail_qs.iterator(chunk_size=DEFAULT_BATCH_SIZE):
+                    batch.append(detail_content)
+                    if len(batch) >= DEFAULT_BATCH_SIZE:
+                        batch_stats = _check_batch(executor, batch, verify_checksums)
+                        stats.update(batch_stats)
+                        pb.increase_by(batch_stats["files"])
+                        batch = []
+                if batch:
+                    batch_stats = _check_batch(executor, batch, verify_checksums)
+                    stats.update(batch_stats)
+                    pb.increase_by(batch_stats["files"])
+
+    elapsed = max(time.monotonic() - start, 0.001)
+    size_mb = stats["bytes"] / 1024 / 1024
+    _logger.info(
+        _(
+            "Pulp 2 storage check: {files} files, {size:.1f} MB in {elapsed:.1f}s "
+            "({rate:.1f} files/s, {mb_rate:.1f} MB/s), {failed} missing or corrupted."
+        ).format(
+            files=stats["files"],
+            size=size_mb,
+            elapsed=elapsed,
+            rate=stats["files"] / elapsed,
+            mb_rate=size_mb / elapsed,
+            failed=stats["failed"],
+        )
+    )
+
+    # report all the known problems, including the ones found by previous checks
+    for status in FAILED_STATUSES:
+        count = failed_storage_checks(checked_types).filter(storage_check__status=status).count()
+        ProgressReport(
+            message="Pulp 2 content which is {}".format(status),
+            code="checking.pulp2.storage.{}".format(status),
+            total=count,
+            done=count,
+            state="completed",
+        ).save()
+
+
+def _check_batch(executor, batch, verify_checksums):
+    """
+    Check files for a batch of pre-migrated content and save the results.
+
+    Args:
+        executor(concurrent.futures.Executor): An executor to run the checks in
+        batch(list): Pulp2to3Content detail models to check files for
+        verify_checksums(bool): If True, file digests are verified
+
+    Returns:
+        collections.Counter: Number of checked files, their total size and number of failed
+                             checks
+
+    """
+
+    def check(detail_content):
+        return check_file(
+            detail_content.pulp2content.pulp2_storage_path,
+            detail_content.expected_digests,
+            detail_content.expected_size,
+            verify_checksums=verify_checksums,
+        )
+
+    checks = []
+    checked_bytes = 0
+    failed = 0
+    for detail_content, (status, size) in zip(batch, executor.map(check, batch)):
+        checked_bytes += size
+        if status != Pulp2StorageCheck.OK:
+            failed += 1
+            _logger.warning(
+                _("The content located in {} is {}.").format(
+                    detail_content.pulp2content.pulp2_storage_path, status
+                )
+            )
+        checks.append(
+            Pulp2StorageCheck(
+                pulp2content=detail_content.pulp2content,
+                status=status,
+                checksums_verified=verify_checksums,
+                pulp2_last_updated=detail_content.pulp2content.pulp2_last_updated,
+            )
+        )
+
+    with transaction.atomic():
+        Pulp2StorageCheck.objects.filter(
+            pulp2content__in=[check.pulp2content for check in checks]
+        ).delete()
+        Pulp2StorageCheck.objects.bulk_create(checks, batch_size=DEFAULT_BATCH_SIZE)
+
+    return Counter(files=len(checks), bytes=checked_bytes, failed=failed)
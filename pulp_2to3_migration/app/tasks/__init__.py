@@ -1,2 +1,4 @@
+from .benchmark import benchmark_content_migration  # noqa
+from .check import check_storage  # noqa
 from .migrate import migrate_from_pulp2  # noqa
 from .reset import reset_pulp3_data  # noqa
@@ -0,0 +1,86 @@
+import json
+import logging
+import time
+
+from gettext import gettext as _
+
+from django.test.utils import override_settings
+
+from pulpcore.plugin.models import ProgressReport
+from pulpcore.plugin.tasking import orphan_cleanup
+
+from pulp_2to3_migration.app.migration import migrate_content
+from pulp_2to3_migration.app.models import MigrationPlan, Pulp2Content
+from pulp_2to3_migration.app.pre_migration import (
+    pre_migrate_all_content,
+    pre_migrate_all_without_content,
+)
+from pulp_2to3_migration.app.tasks.reset import reset_pulp3_data
+from pulp_2to3_migration.pulp2 import connection
+
+_logger = logging.getLogger(__name__)
+
+
+def benchmark_content_migration(migration_plan_pk, pipeline_configs):
+    """
+    Measure content migration time for different configurations of the migration pipeline.
+
+    For every configuration, Pulp 3 data for the plugins in the migration plan is reset, all the
+    orphan content and artifacts are removed, Pulp 2 content is pre-migrated and then migrated to
+    Pulp 3 with per-stage instrumentation enabled. Only the content migration itself is timed.
+    Thanks to the orphan cleanup, every run creates all the artifacts, not only the first one.
+
+    The task is destructive, it's meant to be run on a staging copy of the Pulp 3 database.
+
+    Args:
+        migration_plan_pk (str): The migration plan PK.
+        pipeline_configs (list): Pipeline configurations to try, each of them is used for all
+                                 the plugins in the migration plan, see the
+                                 ``CONTENT_MIGRATION_PIPELINE`` setting.
+    """
+
+    # MongoDB connection initialization
+    connection.initialize()
+
+    plan = MigrationPlan.objects.get(pk=migration_plan_pk)
+    content_types = [
+        content_type
+        for plugin in plan.get_plugin_plans()
+        for content_type in plugin.migrator.content_models
+    ]
+
+    for pipeline_config in pipeline_configs:
+        reset_pulp3_data(migration_plan_pk)
+        # artifacts of the removed content are not removed by the reset, without orphan cleanup
+        # they would be found as existing ones and not created again
+        orphan_cleanup(orphan_protection_time=0)
+        pre_migrate_all_without_content(plan)
+        pre_migrate_all_content(plan)
+
+        pipeline_setting = {plugin: pipeline_config for plugin in plan.get_plugins()}
+        with override_settings(
+            CONTENT_MIGRATION_PIPELINE=pipeline_setting, CONTENT_MIGRATION_INSTRUMENTATION=True
+        ):
+            start = time.monotonic()
+            migrate_content(plan)
+            elapsed = time.monotonic() - start
+
+        migrated = Pulp2Content.objects.filter(
+            pulp2_content_type_id__in=content_types, pulp3_content__isnull=False
+        ).count()
+        config = json.dumps(pipeline_config, sort_keys=True)
+        ProgressReport(
+            message=_("Content migration with pipeline {config}: {elapsed:.1f}s").format(
+                config=config, elapsed=elapsed
+            ),
+            code="benchmark.content.migration",
+            total=migrated,
+            done=migrated,
+            suffix=config,
+            state="completed",
+        ).save()
+        _logger.info(
+            _("Migrated {count} content units in {elapsed:.1f}s with pipeline {config}").format(
+                count=migrated, elapsed=elapsed, config=config
+            )
+        )
@@ -0,0 +1,30 @@
+from pulp_2to3_migration.app.models import MigrationPlan
+from pulp_2to3_migration.app.pre_migration import (
+    pre_migrate_all_content,
+    pre_migrate_all_without_content,
+)
+from pulp_2to3_migration.app.storage_check import check_pulp2_storage
+from pulp_2to3_migration.pulp2 import connection
+
+
+def check_storage(migration_plan_pk, verify_checksums=False):
+    """
+    Check Pulp 2 storage for missing or corrupted content before the migration.
+
+    Pulp 2 content is pre-migrated first, the same way as at the beginning of a migration, so
+    the subsequent migration run doesn't need to do it again.
+
+    Args:
+        migration_plan_pk (str): The migration plan PK.
+        verify_checksums (bool): If True, file digests are verified, otherwise only presence
+                                 and size of the files are checked.
+    """
+
+    # MongoDB connection initialization
+    connection.initialize()
+
+    plan = MigrationPlan.objects.get(pk=migration_plan_pk)
+
+    pre_migrate_all_without_content(plan)
+    pre_migrate_all_content(plan)
+    check_pulp2_storage(plan, verify_checksums=verify_checksums)
@@ -1,5 +1,7 @@
 import logging
 
+from django.conf import settings
+
 from pulpcore.plugin.models import (
     CreatedResource,
     GroupProgressReport,
@@ -7,6 +9,7 @@ from pulpcore.plugin.models import (
     TaskGroup,
 )
 
+from pulp_2to3_migration.app.constants import SKIPPED_CONTENT_INCLUDE
 from pulp_2to3_migration.app.pre_migration import (
     handle_outdated_resources,
     pre_migrate_all_content,
@@ -15,6 +18,7 @@ from pulp_2to3_migration.app.pre_migration import (
 
 from pulp_2to3_migration.app.migration import (
     create_repoversions_publications_distributions,
+    dispatch_content_migration,
     migrate_content,
     migrate_importers,
     migrate_repositories,
@@ -27,7 +31,13 @@ from pulp_2to3_migration.pulp2 import connection
 _logger = logging.getLogger(__name__)
 
 
-def migrate_from_pulp2(migration_plan_pk, validate=False, dry_run=False, skip_corrupted=False):
+def migrate_from_pulp2(
+    migration_plan_pk,
+    validate=False,
+    dry_run=False,
+    skip_corrupted=False,
+    skipped_content=SKIPPED_CONTENT_INCLUDE,
+):
     """
     Main task to migrate from Pulp 2 to Pulp 3.
 
@@ -39,6 +49,8 @@ def migrate_from_pulp2(migration_plan_pk, validate=False, dry_run=False, skip_co
         dry_run (bool): If True, nothing is migrated, only validation happens.
         skip_corrupted (bool): If True, corrupted content is skipped during migration,
                                no task failure.
+        skipped_content (str): Whether to migrate content skipped during previous migration
+                               runs, ``include``, ``only`` or ``exclude`` it.
     """
 
     # MongoDB connection initialization
@@ -80,7 +92,15 @@ def migrate_from_pulp2(migration_plan_pk, validate=False, dry_run=False, skip_co
     handle_outdated_resources(plan)
     migrate_repositories(plan)
     migrate_importers(plan)
-    migrate_content(plan, skip_corrupted=skip_corrupted)
+
+    if settings.CONTENT_MIGRATION_SHARD_SIZE:
+        # content migration, repo versions and distributions creation continue in sub-tasks
+        dispatch_content_migration(
+            plan, skip_corrupted=skip_corrupted, skipped_content=skipped_content
+        )
+        return
+
+    migrate_content(plan, skip_corrupted=skip_corrupted, skipped_content=skipped_content)
     create_repoversions_publications_distributions(plan)
 
     task_group.finish()
@@ -22,14 +22,17 @@ from pulpcore.plugin.viewsets import (
 )
 
 from .constants import PULP_2TO3_MIGRATION_RESOURCE
-from .models import MigrationPlan, Pulp2Content, Pulp2Repository
+from .models import MigrationPlan, Pulp2Content, Pulp2Repository, Pulp2SkippedContent
 from .serializers import (
+    MigrationPlanCheckStorageSerializer,
     MigrationPlanSerializer,
     MigrationPlanRunSerializer,
     Pulp2ContentSerializer,
     Pulp2RepositoriesSerializer,
+    Pulp2SkippedContentSerializer,
 )
 from .tasks import (
+    check_storage,
     migrate_from_pulp2,
     reset_pulp3_data,
 )
@@ -94,6 +97,7 @@ class MigrationPlanViewSet(
         validate = serializer.validated_data.get("validate", False)
         dry_run = serializer.validated_data.get("dry_run", False)
         skip_corrupted = serializer.validated_data.get("skip_corrupted", False)
+        skipped_content = serializer.validated_data.get("skipped_content")
 
         if is_migration_plan_running():
             raise ValidationError(_("Only one migration plan can run or be reset at a time"))
@@ -106,6 +110,41 @@ class MigrationPlanViewSet(
                 "validate": validate,
                 "dry_run": dry_run,
                 "skip_corrupted": skip_corrupted,
+                "skipped_content": skipped_content,
+            },
+        )
+        return OperationPostponedResponse(result, request)
+
+    @extend_schema(
+        summary="Check Pulp 2 storage for the migration plan",
+        description="Trigger an asynchronous task to check that files of Pulp 2 content "
+        "specified in the migration plan are present and not corrupted.",
+        responses={202: AsyncOperationResponseSerializer},
+    )
+    @action(
+        detail=True,
+        methods=("post",),
+        url_path="check-storage",
+        serializer_class=MigrationPlanCheckStorageSerializer,
+    )
+    def check_storage(self, request, pk):
+        """Check Pulp 2 storage for the content specified in the migration plan."""
+        migration_plan = self.get_object()
+        serializer = MigrationPlanCheckStorageSerializer(
+            data=request.data, context={"request": request}
+        )
+        serializer.is_valid(raise_exception=True)
+        verify_checksums = serializer.validated_data.get("verify_checksums", False)
+
+        if is_migration_plan_running():
+            raise ValidationError(_("Only one migration plan can run or be reset at a time"))
+
+        result = dispatch(
+            check_storage,
+            exclusive_resources=[PULP_2TO3_MIGRATION_RESOURCE],
+            kwargs={
+                "migration_plan_pk": str(migration_plan.pk),
+                "verify_checksums": verify_checksums,
             },
         )
         return OperationPostponedResponse(result, request)
@@ -165,6 +204,35 @@ class Pulp2ContentViewSet(NamedModelViewSet, mixins.RetrieveModelMixin, mixins.L
     filterset_class = Pulp2ContentFilter
 
 
+class Pulp2SkippedContentFilter(BaseFilterSet):
+    """
+    Filter for Pulp2SkippedContent ViewSet.
+    """
+
+    pulp2_content_type_id = filters.CharFilter()
+    reason = filters.CharFilter()
+
+    class Meta:
+        model = Pulp2SkippedContent
+        fields = {
+            "pulp2_content_type_id": ["exact", "in"],
+            "reason": ["exact"],
+        }
+
+
+class Pulp2SkippedContentViewSet(
+    NamedModelViewSet, mixins.RetrieveModelMixin, mixins.ListModelMixin
+):
+    """
+    ViewSet for Pulp2SkippedContent model.
+    """
+
+    endpoint_name = "pulp2skippedcontent"
+    queryset = Pulp2SkippedContent.objects.select_related("pulp2content")
+    serializer_class = Pulp2SkippedContentSerializer
+    filterset_class = Pulp2SkippedContentFilter
+
+
 class Pulp2RepositoriesFilter(BaseFilterSet):
     """
     Filter for Pulp2Repositories ViewSet.
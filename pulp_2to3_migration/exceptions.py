@@ -47,3 +47,21 @@ class ArtifactValidationError(PulpException):
 
     def __str__(self):
         return self.msg
+
+
+class ContentMigrationError(PulpException):
+    """
+    Exception for the issues with content migration split into multiple tasks.
+
+    """
+
+    def __init__(self, msg):
+        """
+        :param msg: error message specifying what exactly went wrong
+        :type msg: str
+        """
+        super().__init__("PLP_2TO3_0004")
+        self.msg = msg
+
+    def __str__(self):
+        return self.msg
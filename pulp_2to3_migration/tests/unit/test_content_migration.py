@@ -0,0 +1,78 @@
+import os
+import shutil
+import tempfile
+from unittest import mock
+
+from asgiref.sync import async_to_sync
+from django.test import TestCase
+
+from pulpcore.plugin.models import Artifact
+
+from pulp_2to3_migration.app.models import (
+    Pulp2Content,
+    Pulp2LazyCatalog,
+    Pulp2SkippedContent,
+)
+from pulp_2to3_migration.app.plugin.content import ContentMigrationFirstStage
+
+
+class TestCreateImageArtifacts(TestCase):
+    """Test creation of artifacts for the images of a distribution tree."""
+
+    def setUp(self):
+        """Create a downloaded distribution tree with images."""
+        self.storage_path = tempfile.mkdtemp()
+        self.images = ["images/boot.iso", "images/pxeboot/vmlinuz"]
+        for image in self.images:
+            image_path = os.path.join(self.storage_path, image)
+            os.makedirs(os.path.dirname(image_path), exist_ok=True)
+            with open(image_path, "wb") as fp:
+                fp.write(b"image")
+        self.pulp2content = Pulp2Content.objects.create(
+            pulp2_id="distribution-id",
+            pulp2_content_type_id="distribution",
+            pulp2_last_updated=0,
+            pulp2_storage_path=self.storage_path,
+            downloaded=True,
+        )
+
+    def tearDown(self):
+        """Remove the distribution tree."""
+        shutil.rmtree(self.storage_path)
+
+    def create_image_artifacts(self, missing_image=None):
+        """Create artifacts for the images, one of them can be missing."""
+
+        def place_artifact(path, **kwargs):
+            if missing_image and path.endswith(missing_image):
+                raise FileNotFoundError(path)
+            return Artifact()
+
+        first_stage = ContentMigrationFirstStage(None, skip_corrupted=True)
+        with mock.patch(
+            "pulp_2to3_migration.app.plugin.content.place_artifact", side_effect=place_artifact
+        ):
+            return async_to_sync(first_stage.create_image_artifacts)(
+                self.pulp2content, self.images, Pulp2LazyCatalog.objects.none(), {}
+            )
+
+    def test_all_images(self):
+        """Test that an artifact is created for each image."""
+        d_artifacts, remotes, missing_artifact = self.create_image_artifacts()
+        self.assertEqual(
+            [da.relative_path for da in d_artifacts],
+            self.images,
+        )
+        self.assertEqual(remotes, set())
+        self.assertFalse(missing_artifact)
+        self.assertFalse(Pulp2SkippedContent.objects.exists())
+
+    def test_missing_image_skips_distribution(self):
+        """Test that a distribution tree with a missing image is skipped as a whole."""
+        result = self.create_image_artifacts(missing_image="vmlinuz")
+        self.assertIsNone(result)
+        skipped = Pulp2SkippedContent.objects.get(pulp2content=self.pulp2content)
+        self.assertEqual(skipped.reason, Pulp2SkippedContent.MISSING)
+        self.assertEqual(
+            skipped.pulp2_storage_path, os.path.join(self.storage_path, "images/pxeboot/vmlinuz")
+        )
@@ -0,0 +1,49 @@
+from django.test import TestCase, override_settings
+
+from pulpcore.plugin.constants import TASK_STATES
+from pulpcore.plugin.models import Task, TaskGroup
+
+from pulp_2to3_migration.app.constants import PULP_2TO3_PUBLICATION_RESOURCE
+from pulp_2to3_migration.app.migration import get_publication_slot, migrate_repo_distributors
+
+TASK_NAME = f"{migrate_repo_distributors.__module__}.{migrate_repo_distributors.__name__}"
+
+
+@override_settings(PARALLEL_PUBLICATION_TASKS=3)
+class TestGetPublicationSlot(TestCase):
+    """Test the choice of a publication resource for a publication task."""
+
+    def setUp(self):
+        """Create a task group."""
+        self.task_group = TaskGroup.objects.create(description="Migration Sub-tasks")
+
+    def create_task(self, slot, state=TASK_STATES.WAITING, name=TASK_NAME):
+        """Create a task of the task group which reserves a publication resource."""
+        Task.objects.create(
+            state=state,
+            name=name,
+            task_group=self.task_group,
+            reserved_resources_record=[f"{PULP_2TO3_PUBLICATION_RESOURCE}.{slot}"],
+        )
+
+    def test_least_busy_slot(self):
+        """Test that the slot with the fewest unfinished publication tasks is picked."""
+        self.create_task(0)
+        self.create_task(0, state=TASK_STATES.RUNNING)
+        self.create_task(1)
+        self.create_task(2, state=TASK_STATES.COMPLETED)
+        self.create_task(2, state=TASK_STATES.FAILED)
+        self.assertEqual(
+            get_publication_slot(self.task_group), f"{PULP_2TO3_PUBLICATION_RESOURCE}.2"
+        )
+
+    def test_other_tasks_ignored(self):
+        """Test that tasks other than publication tasks are not taken into account."""
+        self.create_task(0, name="pulp_2to3_migration.app.migration.complex_repo_migration")
+        self.assertEqual(
+            get_publication_slot(self.task_group), f"{PULP_2TO3_PUBLICATION_RESOURCE}.0"
+        )
+        self.create_task(0)
+        self.assertEqual(
+            get_publication_slot(self.task_group), f"{PULP_2TO3_PUBLICATION_RESOURCE}.1"
+        )
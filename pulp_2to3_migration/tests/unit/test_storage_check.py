@@ -0,0 +1,48 @@
+import hashlib
+import os
+import tempfile
+
+from django.test import TestCase
+
+from pulp_2to3_migration.app.models import Pulp2StorageCheck
+from pulp_2to3_migration.app.storage_check import check_file
+
+
+class TestCheckFile(TestCase):
+    """Test checking of a file in Pulp 2 storage."""
+
+    def setUp(self):
+        """Create a file to check."""
+        self.data = b"pulp 2 content"
+        fd, self.path = tempfile.mkstemp()
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(self.data)
+        self.sha256 = hashlib.sha256(self.data).hexdigest()
+
+    def tearDown(self):
+        """Remove the file."""
+        os.unlink(self.path)
+
+    def test_missing_file(self):
+        """Test that a missing file is reported."""
+        status, _ = check_file(self.path + ".missing")
+        self.assertEqual(status, Pulp2StorageCheck.MISSING)
+
+    def test_wrong_size(self):
+        """Test that a file of an unexpected size is reported as corrupted."""
+        status, _ = check_file(self.path, expected_size=len(self.data) + 1)
+        self.assertEqual(status, Pulp2StorageCheck.CORRUPTED)
+
+    def test_checksums_not_verified_by_default(self):
+        """Test that digests are not verified unless requested."""
+        status, size = check_file(self.path, {"sha256": "0" * 64}, len(self.data))
+        self.assertEqual(status, Pulp2StorageCheck.OK)
+        self.assertEqual(size, len(self.data))
+
+    def test_verify_checksums(self):
+        """Test that digests are verified when requested."""
+        status, _ = check_file(self.path, {"sha256": self.sha256}, verify_checksums=True)
+        self.assertEqual(status, Pulp2StorageCheck.OK)
+
+        status, _ = check_file(self.path, {"sha256": "0" * 64}, verify_checksums=True)
+        self.assertEqual(status, Pulp2StorageCheck.CORRUPTED)
@@ -0,0 +1,170 @@
+import zlib
+
+from types import SimpleNamespace
+
+from django.test import TestCase
+
+from pulp_rpm.app.models import Package
+
+from pulp_2to3_migration.app.plugin.rpm.package_creation import (
+    create_package_dicts,
+    get_package_templates,
+)
+from pulp_2to3_migration.app.plugin.rpm.xml_utils import (
+    ESCAPE_TEMPLATE_VARS_TAGS,
+    _render_django_template,
+    get_cr_obj,
+    parse_repodata,
+    parse_repodata_batch,
+    render_filelists,
+    render_other,
+    render_primary,
+    render_template,
+)
+
+PRIMARY_TEMPLATE = """<package type="rpm">
+  <name>shark</name>
+  <arch>noarch</arch>
+  <version epoch="0" ver="0.1" rel="1"/>
+  <checksum type="{{ checksumtype }}" pkgid="YES">{{ checksum }}</checksum>
+  <summary>A dummy package of {shark}</summary>
+  <description>A dummy package of shark, {{ not a variable }} {% if x %} {# #} }}{{</description>
+  <packager>Pulp &lt;pulp-list@redhat.com&gt;</packager>
+  <url>http://tstrachota.fedorapeople.org</url>
+  <time file="1331832459" build="1331831376"/>
+  <size package="2424" installed="42" archive="296"/>
+  <location href="shark-0.1-1.noarch.rpm"/>
+  <format>
+    <rpm:license>GPLv2</rpm:license>
+    <rpm:vendor/>
+    <rpm:group>Internet/Applications</rpm:group>
+    <rpm:buildhost>smqe-ws15</rpm:buildhost>
+    <rpm:sourcerpm>shark-0.1-1.src.rpm</rpm:sourcerpm>
+    <rpm:header-range start="872" end="2293"/>
+    <rpm:provides>
+      <rpm:entry name="shark" flags="EQ" epoch="0" ver="0.1" rel="1"/>
+    </rpm:provides>
+    <file>/tmp/shark.txt</file>
+  </format>
+</package>
+"""
+
+OTHER_TEMPLATE = """<package pkgid="{{ pkgid }}" name="shark" arch="noarch">
+  <version epoch="0" ver="0.1" rel="1"/>
+  <changelog author="Pulp - 0.1-1" date="1331769600">- {% raw %}{{x}}</changelog>
+  <changelog author="Pulp - 0.1-2" date="1331856000">- {#}</changelog>
+</package>
+"""
+
+FILELISTS_TEMPLATE = """<package pkgid="{{ pkgid }}" name="shark" arch="noarch">
+  <version epoch="0" ver="0.1" rel="1"/>
+  <file>/tmp/{{shark}}.txt</file>
+  <file type="dir">/tmp/{%</file>
+</package>
+"""
+
+CHECKSUM = "b6ee8c6b7d1f2f8e3b8a2f0a3a3d54d0f5e5a4a0b8f0b2a9d6c0b8e2d1c9a7f3"
+
+
+class TestRenderTemplate(TestCase):
+    """Test rendering of Pulp 2 metadata snippet templates."""
+
+    def assertRenderedAsDjango(self, template, context, md_type):
+        """Assert that a template is rendered the same way as with the Django template engine."""
+        escape_tags = ESCAPE_TEMPLATE_VARS_TAGS[md_type]
+        self.assertEqual(
+            render_template(template, context, escape_tags),
+            _render_django_template(template, context, escape_tags),
+        )
+
+    def test_primary(self):
+        """Test that primary snippet is rendered as by the Django template engine."""
+        context = {"checksum": CHECKSUM, "checksumtype": "sha256"}
+        self.assertRenderedAsDjango(PRIMARY_TEMPLATE, context, "primary")
+        self.assertIn(
+            '<checksum type="sha256" pkgid="YES">{}</checksum>'.format(CHECKSUM),
+            render_template(PRIMARY_TEMPLATE, context, ESCAPE_TEMPLATE_VARS_TAGS["primary"]),
+        )
+
+    def test_other(self):
+        """Test that other snippet is rendered as by the Django template engine."""
+        self.assertRenderedAsDjango(OTHER_TEMPLATE, {"pkgid": CHECKSUM}, "other")
+
+    def test_filelists(self):
+        """Test that filelists snippet is rendered as by the Django template engine."""
+        self.assertRenderedAsDjango(FILELISTS_TEMPLATE, {"pkgid": CHECKSUM}, "filelists")
+
+    def test_unknown_syntax(self):
+        """Test that templates with other template syntax are rendered by Django."""
+        template = PRIMARY_TEMPLATE.replace("<url>", "<url>{{ base_url }}")
+        context = {"checksum": CHECKSUM, "checksumtype": "sha256"}
+        self.assertRenderedAsDjango(template, context, "primary")
+
+
+class TestParseRepodataBatch(TestCase):
+    """Test parsing of metadata snippets of multiple packages at once."""
+
+    def render_snippets(self, checksum):
+        """Render primary, filelists and other snippets of a package with the given checksum."""
+        return (
+            render_primary(PRIMARY_TEMPLATE, checksum, "sha256"),
+            render_filelists(FILELISTS_TEMPLATE, checksum),
+            render_other(OTHER_TEMPLATE, checksum),
+        )
+
+    def test_parse_repodata_batch(self):
+        """Test that packages are parsed the same way as one by one, including duplicate pkgIds."""
+        snippets = [
+            self.render_snippets(CHECKSUM),
+            self.render_snippets(CHECKSUM[::-1]),
+            self.render_snippets(CHECKSUM),
+        ]
+        packages = parse_repodata_batch(*zip(*snippets))
+        self.assertEqual(len(packages), len(snippets))
+        for package, package_snippets in zip(packages, snippets):
+            expected = parse_repodata(*package_snippets)
+            self.assertEqual(package.pkgId, expected.pkgId)
+            self.assertEqual(package.files, expected.files)
+            self.assertEqual(package.changelogs, expected.changelogs)
+        self.assertEqual(packages[1].pkgId, CHECKSUM[::-1])
+
+    def test_parse_repodata_batch_mismatched_pkgid(self):
+        """Test that filelists and other data are not lost if their pkgid doesn't match."""
+        primary_xml, filelists_xml, other_xml = self.render_snippets(CHECKSUM)
+        snippets = [
+            self.render_snippets(CHECKSUM[::-1]),
+            (
+                primary_xml,
+                render_filelists(FILELISTS_TEMPLATE, "mismatched"),
+                render_other(OTHER_TEMPLATE, "mismatched"),
+            ),
+        ]
+        packages = parse_repodata_batch(*zip(*snippets))
+        for package, package_snippets in zip(packages, snippets):
+            expected = parse_repodata(*package_snippets)
+            self.assertEqual(package.files, expected.files)
+            self.assertEqual(package.changelogs, expected.changelogs)
+        self.assertTrue(packages[1].files)
+        self.assertTrue(packages[1].changelogs)
+
+
+class TestCreatePackageDicts(TestCase):
+    """Test creation of data for Packages from the compressed metadata templates."""
+
+    def make_package(self, checksum):
+        """Make an object with the attributes of a pre-migrated package which are needed."""
+        return SimpleNamespace(
+            primary_template_gz=memoryview(zlib.compress(PRIMARY_TEMPLATE.encode())),
+            filelists_template_gz=memoryview(zlib.compress(FILELISTS_TEMPLATE.encode())),
+            other_template_gz=memoryview(zlib.compress(OTHER_TEMPLATE.encode())),
+            checksum=checksum,
+            checksumtype="sha256",
+        )
+
+    def test_create_package_dicts(self):
+        """Test that the data is the same as for the packages converted one by one."""
+        packages = [self.make_package(CHECKSUM), self.make_package(CHECKSUM[::-1])]
+        pkg_dicts = create_package_dicts([get_package_templates(pkg) for pkg in packages])
+        self.assertEqual(
+            pkg_dicts, [Package.createrepo_to_dict(get_cr_obj(pkg)) for pkg in packages]
+        )